@@ -0,0 +1,110 @@
+"""
+Shared response cache for expensive read endpoints such as dashboards.
+
+Entries are keyed by role and scope, expire after a TTL, and are dropped as
+soon as a commit writes to any table they were built from (the "db" topic
+on the event bus). Concurrent misses for the same key are computed once
+(see coalesce.py). Values are stored JSON-encoded and must not be mutated;
+layer per-user fields on a copy.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Hashable, Iterable, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from . import coalesce, events, models
+
+class ResponseCache:
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at, tables, value)
+        self._generations = defaultdict(int)  # table -> invalidation count
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_compute(self, key: Hashable, tables: Iterable[str], compute: Callable[[], object]):
+        """Cached value for key, computing (and caching) it on a miss"""
+        if not coalesce.route_enabled(f"{self.name}.{key[0]}"):
+            return self._compute(key, tables, compute)
+        return coalesce.flight.do((self.name,) + tuple(key), lambda: self._compute(key, tables, compute))
+    
+    def _compute(self, key: Hashable, tables: Iterable[str], compute: Callable[[], object]):
+        if self.ttl <= 0:
+            return jsonable_encoder(compute())
+        
+        tables = frozenset(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            generations = {table: self._generations[table] for table in tables}
+        
+        value = jsonable_encoder(compute())
+        
+        with self._lock:
+            # Skip storing if a write landed while we were computing
+            if all(self._generations[table] == gen for table, gen in generations.items()):
+                self._entries[key] = (time.monotonic() + self.ttl, tables, value)
+        return value
+    
+    def invalidate(self, tables: Iterable[str]):
+        tables = set(tables)
+        with self._lock:
+            for table in tables:
+                self._generations[table] += 1
+            for key in [key for key, entry in self._entries.items() if entry[1] & tables]:
+                del self._entries[key]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl_seconds": self.ttl}
+
+dashboard_cache = ResponseCache("dashboards", float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30")))
+events.bus.add_listener("db", lambda event: dashboard_cache.invalidate(event["tables"]))
+
+class TechnicianIdentityMap:
+    """
+    user_id -> (technician_id, name) through the unique Technician.user_id
+    link. Loaded with one query on first use and dropped whenever a commit
+    writes Technician, so linking or creating a technician shows up
+    on the next lookup.
+    """
+    TABLES = {"Technician"}
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_user = None
+        self._generation = 0
+    
+    def get(self, db: Session, user_id: int) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            by_user, generation = self._by_user, self._generation
+        if by_user is None:
+            rows = db.query(
+                models.Technician.user_id, models.Technician.technician_id, models.Technician.name
+            ).filter(models.Technician.user_id.isnot(None)).all()
+            by_user = {row.user_id: (row.technician_id, row.name) for row in rows}
+            with self._lock:
+                if self._generation == generation:
+                    self._by_user = by_user
+        return by_user.get(user_id)
+    
+    def invalidate(self, tables: Iterable[str] = None):
+        if tables is not None and not self.TABLES & set(tables):
+            return
+        with self._lock:
+            self._by_user = None
+            self._generation += 1
+
+technician_identities = TechnicianIdentityMap()
+events.bus.add_listener("db", lambda event: technician_identities.invalidate(event["tables"]))
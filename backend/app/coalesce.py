@@ -0,0 +1,92 @@
+"""
+Single-flight request coalescing.
+
+Identical requests that arrive while one is already being computed wait
+for that computation and share its (JSON-encoded) result instead of
+running the same queries again.
+
+Enabled per route by name. Set REQUEST_COALESCING=false to turn it off
+everywhere, or list route names in DISABLE_COALESCING_ROUTES
+(e.g. "assets.summary,dashboards.planner") to turn off individual routes.
+Both are read on every request.
+"""
+import functools
+import inspect
+import os
+import threading
+from typing import Callable, Hashable, Iterable
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+def route_enabled(name: str) -> bool:
+    if os.getenv("REQUEST_COALESCING", "true").lower() != "true":
+        return False
+    disabled = {route.strip() for route in os.getenv("DISABLE_COALESCING_ROUTES", "").split(",")}
+    return name not in disabled
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+    
+    def do(self, key: Hashable, compute: Callable[[], object]):
+        """Run compute for key, or wait for the in-flight run and share its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = compute()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+flight = SingleFlight()
+
+def coalesce_requests(name: str, ignore: Iterable[str] = ()):
+    """
+    Decorate a sync GET endpoint so concurrent calls with the same arguments
+    (minus the DB session and any `ignore`d parameters) run once.
+    """
+    ignore = set(ignore)
+    
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Settings are read per call so they can be changed without a restart
+            if not route_enabled(name):
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            key = (name,) + tuple(
+                (param, repr(value)) for param, value in sorted(bound.arguments.items())
+                if param not in ignore and not isinstance(value, Session)
+            )
+            return flight.do(key, lambda: jsonable_encoder(func(*args, **kwargs)))
+        return wrapper
+    return decorator
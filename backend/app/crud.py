@@ -1,8 +1,10 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from . import models, schemas
+from sqlalchemy.orm import Session, joinedload, selectinload, aliased
+from sqlalchemy import and_, or_, func, case, update, insert, select
+from . import models, schemas, rollups
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import os
+import re
 
 # Asset CRUD Operations
 def create_asset(db: Session, asset: schemas.AssetCreate):
@@ -12,15 +14,34 @@ def create_asset(db: Session, asset: schemas.AssetCreate):
     db.refresh(db_asset)
     return db_asset
 
+def sparse_columns(model, schema, fields: Optional[str]):
+    """
+    Columns for a `fields=a,b` list parameter, limited to fields of the
+    response schema; the primary key is always included. None means whole rows.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    allowed = set(schema.model_fields) & set(model.__table__.columns.keys())
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(sorted(allowed))}")
+    primary_key = model.__mapper__.primary_key[0].key
+    return [getattr(model, name) for name in dict.fromkeys([primary_key] + names)]
+
 def get_assets(
     db: Session, 
     skip: int = 0, 
     limit: int = 100,
     asset_type: Optional[str] = None,
     status: Optional[str] = None,
-    location: Optional[str] = None
+    location: Optional[str] = None,
+    columns: Optional[list] = None
 ):
+    """Assets, or only the given columns as rows when `columns` is set"""
     query = db.query(models.Asset)
+    if columns:
+        query = query.with_entities(*columns)
     
     if asset_type:
         query = query.filter(models.Asset.asset_type == asset_type)
@@ -56,6 +77,7 @@ def delete_asset(db: Session, asset_id: int):
     db_asset = get_asset(db, asset_id)
     if db_asset:
         db.delete(db_asset)
+        record_tombstones(db, 'Asset', [asset_id])
         db.commit()
         return True
     return False
@@ -114,18 +136,70 @@ def get_splitter(db: Session, splitter_id: int):
 def create_customer(db: Session, customer: schemas.CustomerCreate):
     db_customer = models.Customer(**customer.dict())
     db.add(db_customer)
+    db.flush()
+    index_customer_search(db, db_customer)
     db.commit()
     db.refresh(db_customer)
     return db_customer
 
-def get_customers(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None):
-    query = db.query(models.Customer)
+def live_customers(db: Session):
+    """Customer query that excludes soft-deleted rows"""
+    return db.query(models.Customer).filter(models.Customer.deleted_at.is_(None))
+
+def get_customers(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    columns: Optional[list] = None
+):
+    """Live customers, or only the given columns as rows when `columns` is set"""
+    query = live_customers(db)
+    if columns:
+        query = query.with_entities(*columns)
     if status:
         query = query.filter(models.Customer.status == status)
     return query.offset(skip).limit(limit).all()
 
 def get_customer(db: Session, customer_id: int):
-    return db.query(models.Customer).filter(models.Customer.customer_id == customer_id).first()
+    return live_customers(db).filter(models.Customer.customer_id == customer_id).first()
+
+def get_customer_with_details(db: Session, customer_id: int):
+    """Load a customer with splitter and assigned assets eagerly (constant query count)"""
+    return live_customers(db).options(
+        joinedload(models.Customer.splitter),
+        selectinload(models.Customer.assigned_assets).joinedload(models.AssignedAssets.asset)
+    ).filter(models.Customer.customer_id == customer_id).first()
+
+def get_latest_tasks_for_customers(db: Session, customer_ids: List[int]):
+    """Return {customer_id: latest DeploymentTask} for the given customers in one query"""
+    if not customer_ids:
+        return {}
+    latest_ids = db.query(
+        func.max(models.DeploymentTask.task_id)
+    ).filter(
+        models.DeploymentTask.customer_id.in_(customer_ids)
+    ).group_by(models.DeploymentTask.customer_id)
+    tasks = db.query(models.DeploymentTask).filter(
+        models.DeploymentTask.task_id.in_(latest_ids)
+    ).all()
+    return {task.customer_id: task for task in tasks}
+
+def get_pending_customers(db: Session, skip: int = 0, limit: int = 100, longest_wait_first: bool = True):
+    """
+    Get a page of pending customers with their assets and latest deployment task.
+    Uses a fixed number of queries regardless of page size.
+    """
+    query = live_customers(db).filter(models.Customer.status == 'Pending')
+    total = query.count()
+    
+    order = models.Customer.created_at.asc() if longest_wait_first else models.Customer.created_at.desc()
+    customers = query.options(
+        selectinload(models.Customer.assigned_assets).joinedload(models.AssignedAssets.asset)
+    ).order_by(order, models.Customer.customer_id).offset(skip).limit(limit).all()
+    
+    latest_tasks = get_latest_tasks_for_customers(db, [c.customer_id for c in customers])
+    return total, customers, latest_tasks
 
 # Topology Functions
 def get_customer_topology(db: Session, customer_id: int):
@@ -197,6 +271,102 @@ def get_customer_topology(db: Session, customer_id: int):
     
     return result
 
+# Customer Search
+SEARCH_FIELDS = ('name', 'address', 'neighborhood')
+SEARCH_MIN_PREFIX = 2
+SEARCH_CANDIDATE_LIMIT = 1000
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize_search_text(text: Optional[str]) -> List[str]:
+    """Split text into lowercase alphanumeric search tokens"""
+    if not text:
+        return []
+    return [token[:100] for token in _TOKEN_RE.findall(text.lower())]
+
+def index_customer_search(db: Session, customer: models.Customer):
+    """Rebuild the search tokens for one customer (caller commits)"""
+    db.query(models.CustomerSearchToken).filter(
+        models.CustomerSearchToken.customer_id == customer.customer_id
+    ).delete(synchronize_session=False)
+    
+    rows = []
+    for field in SEARCH_FIELDS:
+        for token in set(tokenize_search_text(getattr(customer, field))):
+            rows.append({"customer_id": customer.customer_id, "token": token, "field": field})
+    if rows:
+        db.execute(models.CustomerSearchToken.__table__.insert(), rows)
+
+def rebuild_customer_search_index(db: Session, batch_size: int = 1000):
+    """Re-tokenize every customer in batches. Returns the number of customers indexed."""
+    indexed = 0
+    last_id = 0
+    while True:
+        customers = db.query(models.Customer).filter(
+            models.Customer.customer_id > last_id
+        ).order_by(models.Customer.customer_id).limit(batch_size).all()
+        if not customers:
+            break
+        for customer in customers:
+            index_customer_search(db, customer)
+        db.commit()
+        indexed += len(customers)
+        last_id = customers[-1].customer_id
+    return indexed
+
+def search_customers(
+    db: Session,
+    q: str,
+    limit: int = 20,
+    status: Optional[str] = None,
+    region: Optional[str] = None,
+    field: Optional[str] = None
+):
+    """
+    Prefix search over customer name, address and neighborhood (or just one
+    of them). Every term of at least SEARCH_MIN_PREFIX characters must
+    prefix-match a token; the last term is treated as typeahead.
+
+    The query is driven from the token index: the longest term's matches are
+    read in (token, customer_id) order and capped at SEARCH_CANDIDATE_LIMIT
+    before the other terms and Customer are joined, so short prefixes never
+    materialize or sort the full match set.
+    """
+    terms = [term for term in dict.fromkeys(tokenize_search_text(q)) if len(term) >= SEARCH_MIN_PREFIX]
+    if not terms:
+        return []
+    Token = models.CustomerSearchToken
+    
+    def matching(term):
+        query = db.query(Token.customer_id).filter(Token.token.like(f"{term}%"))
+        return query.filter(Token.field == field) if field else query
+    
+    driving = max(terms, key=len)
+    candidates = list(dict.fromkeys(
+        row.customer_id for row in matching(driving).order_by(
+            Token.token, Token.customer_id
+        ).limit(SEARCH_CANDIDATE_LIMIT)
+    ))
+    if not candidates:
+        return []
+    
+    query = live_customers(db).filter(models.Customer.customer_id.in_(candidates))
+    for term in terms:
+        if term != driving:
+            query = query.filter(models.Customer.customer_id.in_(
+                matching(term).filter(Token.customer_id.in_(candidates))
+            ))
+    
+    if status:
+        query = query.filter(models.Customer.status == status)
+    if region:
+        query = query.join(
+            models.Splitter, models.Customer.splitter_id == models.Splitter.splitter_id
+        ).join(
+            models.FDH, models.Splitter.fdh_id == models.FDH.fdh_id
+        ).filter(models.FDH.region == region)
+    
+    return query.order_by(models.Customer.name).limit(limit).all()
+
 def get_fdh_topology(db: Session, fdh_id: int):
     fdh = get_fdh(db, fdh_id)
     if not fdh:
@@ -217,7 +387,7 @@ def get_fdh_topology(db: Session, fdh_id: int):
     total_customers = 0
     
     for splitter in splitters:
-        customers = db.query(models.Customer).filter(
+        customers = live_customers(db).filter(
             models.Customer.splitter_id == splitter.splitter_id
         ).all()
         
@@ -278,19 +448,115 @@ def update_customer(db: Session, customer_id: int, customer_update: schemas.Cust
     db_customer = get_customer(db, customer_id)
     if db_customer:
         update_data = customer_update.dict(exclude_unset=True)
+        if update_data.get("status"):
+            record_status_events(db, [customer_id], update_data["status"], {customer_id: db_customer.status})
         for key, value in update_data.items():
             setattr(db_customer, key, value)
+        if any(field in update_data for field in SEARCH_FIELDS):
+            index_customer_search(db, db_customer)
         db.commit()
         db.refresh(db_customer)
     return db_customer
 
 def delete_customer(db: Session, customer_id: int):
+    """
+    Soft-delete a customer. The row disappears from list queries immediately and
+    its splitter port is released; purge_deleted_customers runs the cascade.
+    """
     db_customer = get_customer(db, customer_id)
-    if db_customer:
-        db.delete(db_customer)
-        db.commit()
-        return True
-    return False
+    if not db_customer:
+        return None
+    db_customer.deleted_at = datetime.utcnow()
+    record_tombstones(db, 'Customer', [customer_id])
+    db.flush()
+    if db_customer.splitter_id:
+        update_splitter_used_ports(db, db_customer.splitter_id)
+    db.commit()
+    return db_customer
+
+def purge_deleted_customers(
+    db: Session,
+    batch_size: int = 200,
+    max_batches: Optional[int] = None,
+    customer_ids: Optional[List[int]] = None
+):
+    """
+    Run the delete cascade for soft-deleted customers (all of them, or just
+    customer_ids) with set-based statements, one bounded batch (and one
+    transaction) at a time. Each batch is locked with SKIP LOCKED, so
+    concurrent purges work on disjoint customers.
+    """
+    totals = {
+        "customers_purged": 0,
+        "reclaimed_assets": 0,
+        "deleted_tasks": 0,
+        "deleted_fiber_lines": 0
+    }
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        query = db.query(models.Customer.customer_id, models.Customer.splitter_id).filter(
+            models.Customer.deleted_at.isnot(None)
+        )
+        if customer_ids is not None:
+            query = query.filter(models.Customer.customer_id.in_(customer_ids))
+        rows = query.order_by(models.Customer.customer_id).limit(batch_size).with_for_update(skip_locked=True).all()
+        if not rows:
+            break
+        
+        batch_ids = [customer_id for customer_id, _ in rows]
+        splitter_ids = list({splitter_id for _, splitter_id in rows if splitter_id})
+        try:
+            totals["deleted_fiber_lines"] += db.query(models.FiberDropLine).filter(
+                models.FiberDropLine.to_customer_id.in_(batch_ids)
+            ).delete(synchronize_session=False)
+            
+            totals["reclaimed_assets"] += db.query(models.Asset).filter(
+                models.Asset.assigned_to_customer_id.in_(batch_ids)
+            ).update({
+                models.Asset.status: 'Available',
+                models.Asset.assigned_to_customer_id: None,
+                models.Asset.assigned_date: None
+            }, synchronize_session=False)
+            
+            db.query(models.AssignedAssets).filter(
+                models.AssignedAssets.customer_id.in_(batch_ids)
+            ).delete(synchronize_session=False)
+            
+            task_ids = db.query(models.DeploymentTask.task_id).filter(
+                models.DeploymentTask.customer_id.in_(batch_ids)
+            )
+            record_tombstones(db, 'DeploymentTask', [row.task_id for row in task_ids])
+            db.query(models.TaskNote).filter(
+                models.TaskNote.task_id.in_(task_ids)
+            ).delete(synchronize_session=False)
+            
+            totals["deleted_tasks"] += db.query(models.DeploymentTask).filter(
+                models.DeploymentTask.customer_id.in_(batch_ids)
+            ).delete(synchronize_session=False)
+            
+            db.query(models.CustomerSearchToken).filter(
+                models.CustomerSearchToken.customer_id.in_(batch_ids)
+            ).delete(synchronize_session=False)
+            
+            db.query(models.CustomerStatusEvent).filter(
+                models.CustomerStatusEvent.customer_id.in_(batch_ids)
+            ).delete(synchronize_session=False)
+            
+            purged = db.query(models.Customer).filter(
+                models.Customer.customer_id.in_(batch_ids)
+            ).delete(synchronize_session=False)
+            
+            if splitter_ids:
+                reconcile_splitter_used_ports(db, splitter_ids=splitter_ids)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        totals["customers_purged"] += purged
+        batches += 1
+    
+    return totals
 
 def assign_customer_assets(db: Session, customer_id: int, ont_id: int, router_id: int):
     """Assign ONT and Router to a customer"""
@@ -347,7 +613,8 @@ def get_available_ports(db: Session, splitter_id: int):
     occupied_ports = db.query(models.Customer.assigned_port).filter(
         models.Customer.splitter_id == splitter_id,
         models.Customer.assigned_port.isnot(None),
-        models.Customer.status.in_(['Active', 'Pending'])  # FIX: Added status filter
+        models.Customer.status.in_(['Active', 'Pending']),  # FIX: Added status filter
+        models.Customer.deleted_at.is_(None)
     ).all()
     
     occupied = {port[0] for port in occupied_ports}
@@ -367,13 +634,216 @@ def update_splitter_used_ports(db: Session, splitter_id: int):
         count = db.query(models.Customer).filter(
             models.Customer.splitter_id == splitter_id,
             models.Customer.assigned_port.isnot(None),
-            models.Customer.status.in_(['Active', 'Pending'])  # FIX: Added status filter
+            models.Customer.status.in_(['Active', 'Pending']),  # FIX: Added status filter
+            models.Customer.deleted_at.is_(None)
         ).count()
         splitter.used_ports = count
         db.commit()
         db.refresh(splitter)
     return splitter
 
+def reconcile_splitter_used_ports(
+    db: Session,
+    apply: bool = True,
+    batch_size: int = 500,
+    splitter_ids: Optional[List[int]] = None
+):
+    """
+    Recompute used_ports for every splitter with one GROUP BY over Customer and
+    fix any drift with bulk UPDATEs. Returns the drift that was found.
+    """
+    occupied = db.query(
+        models.Customer.splitter_id.label('splitter_id'),
+        func.count(models.Customer.customer_id).label('actual')
+    ).filter(
+        models.Customer.splitter_id.isnot(None),
+        models.Customer.assigned_port.isnot(None),
+        models.Customer.status.in_(['Active', 'Pending']),
+        models.Customer.deleted_at.is_(None)
+    )
+    if splitter_ids is not None:
+        occupied = occupied.filter(models.Customer.splitter_id.in_(splitter_ids))
+    occupied = occupied.group_by(models.Customer.splitter_id).subquery()
+    
+    actual = func.coalesce(occupied.c.actual, 0)
+    rows = db.query(
+        models.Splitter.splitter_id,
+        models.Splitter.used_ports,
+        actual
+    ).outerjoin(
+        occupied, occupied.c.splitter_id == models.Splitter.splitter_id
+    ).filter(
+        func.coalesce(models.Splitter.used_ports, -1) != actual
+    )
+    if splitter_ids is not None:
+        rows = rows.filter(models.Splitter.splitter_id.in_(splitter_ids))
+    rows = rows.all()
+    
+    drift = [
+        {"splitter_id": splitter_id, "recorded": recorded, "actual": count}
+        for splitter_id, recorded, count in rows
+    ]
+    
+    if apply and drift:
+        for i in range(0, len(drift), batch_size):
+            chunk = drift[i:i + batch_size]
+            db.execute(
+                update(models.Splitter)
+                .where(models.Splitter.splitter_id.in_([d["splitter_id"] for d in chunk]))
+                .values(used_ports=case(
+                    {d["splitter_id"]: d["actual"] for d in chunk},
+                    value=models.Splitter.splitter_id
+                ))
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    
+    return {
+        "drifted_splitters": len(drift),
+        "applied": apply,
+        "drift": drift
+    }
+
+# Bulk customer status changes
+def find_customers(
+    db: Session,
+    customer_ids: Optional[List[int]] = None,
+    statuses: Optional[List[str]] = None,
+    neighborhood: Optional[str] = None,
+    splitter_id: Optional[int] = None
+):
+    """Return (customer_id, splitter_id) rows for live customers matching the criteria"""
+    query = db.query(models.Customer.customer_id, models.Customer.splitter_id).filter(
+        models.Customer.deleted_at.is_(None)
+    )
+    if customer_ids is not None:
+        query = query.filter(models.Customer.customer_id.in_(customer_ids))
+    if statuses:
+        query = query.filter(models.Customer.status.in_(statuses))
+    if neighborhood:
+        query = query.filter(models.Customer.neighborhood == neighborhood)
+    if splitter_id:
+        query = query.filter(models.Customer.splitter_id == splitter_id)
+    return query.all()
+
+def customer_statuses(db: Session, customer_ids: List[int]):
+    """Current status by customer_id"""
+    return dict(db.query(models.Customer.customer_id, models.Customer.status).filter(
+        models.Customer.customer_id.in_(customer_ids)
+    ).all())
+
+def record_status_events(
+    db: Session,
+    customer_ids: List[int],
+    to_status: str,
+    from_statuses: dict,
+    reclaimed: Optional[dict] = None,
+    reason: Optional[str] = None
+):
+    """Record a status event for each customer whose status actually changes; caller commits"""
+    reclaimed = reclaimed or {}
+    now = datetime.utcnow()
+    rows = [
+        {
+            "customer_id": customer_id,
+            "from_status": from_statuses.get(customer_id),
+            "to_status": to_status,
+            "reclaimed_assets": reclaimed.get(customer_id, 0),
+            "reason": reason[:200] if reason else None,
+            "created_at": now
+        }
+        for customer_id in customer_ids if from_statuses.get(customer_id) != to_status
+    ]
+    if rows:
+        db.execute(insert(models.CustomerStatusEvent), rows)
+
+def deactivate_customers(
+    db: Session,
+    targets,
+    include_asset_details: bool = False,
+    batch_size: int = 1000,
+    reason: Optional[str] = None
+):
+    """
+    Set customers Inactive and release their devices with set-based UPDATEs.
+    `targets` are (customer_id, splitter_id) rows; each affected splitter is recounted once.
+    A status event with the per-customer reclaimed count is recorded for each.
+    """
+    customer_ids = [customer_id for customer_id, _ in targets]
+    splitter_ids = list({splitter_id for _, splitter_id in targets if splitter_id})
+    reclaimed = 0
+    reclaimed_details = []
+    
+    try:
+        for i in range(0, len(customer_ids), batch_size):
+            chunk = customer_ids[i:i + batch_size]
+            from_statuses = customer_statuses(db, chunk)
+            reclaimed_by_customer = dict(db.query(
+                models.Asset.assigned_to_customer_id, func.count(models.Asset.asset_id)
+            ).filter(
+                models.Asset.assigned_to_customer_id.in_(chunk)
+            ).group_by(models.Asset.assigned_to_customer_id).all())
+            if include_asset_details:
+                reclaimed_details.extend(
+                    {"asset_id": asset_id, "type": asset_type, "serial": serial}
+                    for asset_id, asset_type, serial in db.query(
+                        models.Asset.asset_id, models.Asset.asset_type, models.Asset.serial_number
+                    ).filter(models.Asset.assigned_to_customer_id.in_(chunk)).all()
+                )
+            reclaimed += db.query(models.Asset).filter(
+                models.Asset.assigned_to_customer_id.in_(chunk)
+            ).update({
+                models.Asset.status: 'Available',
+                models.Asset.assigned_to_customer_id: None,
+                models.Asset.assigned_date: None
+            }, synchronize_session=False)
+            db.query(models.Customer).filter(
+                models.Customer.customer_id.in_(chunk)
+            ).update({models.Customer.status: 'Inactive'}, synchronize_session=False)
+            record_status_events(db, chunk, 'Inactive', from_statuses, reclaimed_by_customer, reason)
+        
+        if splitter_ids:
+            reconcile_splitter_used_ports(db, splitter_ids=splitter_ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    return {
+        "customers_updated": len(customer_ids),
+        "customer_ids": customer_ids,
+        "reclaimed_assets": reclaimed,
+        "reclaimed_asset_details": reclaimed_details if include_asset_details else None,
+        "splitters_recounted": len(splitter_ids)
+    }
+
+def activate_customers(db: Session, targets, batch_size: int = 1000, reason: Optional[str] = None):
+    """Move Inactive customers back to Pending; each affected splitter is recounted once"""
+    customer_ids = [customer_id for customer_id, _ in targets]
+    splitter_ids = list({splitter_id for _, splitter_id in targets if splitter_id})
+    
+    try:
+        for i in range(0, len(customer_ids), batch_size):
+            chunk = customer_ids[i:i + batch_size]
+            from_statuses = customer_statuses(db, chunk)
+            db.query(models.Customer).filter(
+                models.Customer.customer_id.in_(chunk)
+            ).update({models.Customer.status: 'Pending'}, synchronize_session=False)
+            record_status_events(db, chunk, 'Pending', from_statuses, reason=reason)
+        
+        if splitter_ids:
+            reconcile_splitter_used_ports(db, splitter_ids=splitter_ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    return {
+        "customers_updated": len(customer_ids),
+        "customer_ids": customer_ids,
+        "splitters_recounted": len(splitter_ids)
+    }
+
 def create_customer_with_assignment(db: Session, customer_data: schemas.CustomerOnboardingCreate):
     """Create customer with splitter assignment and assets in one transaction"""
     try:
@@ -386,10 +856,13 @@ def create_customer_with_assignment(db: Session, customer_data: schemas.Customer
             connection_type=customer_data.connection_type,
             status='Pending',
             splitter_id=customer_data.splitter_id,
-            assigned_port=customer_data.assigned_port
+            assigned_port=customer_data.assigned_port,
+            latitude=customer_data.latitude,
+            longitude=customer_data.longitude
         )
         db.add(db_customer)
         db.flush()  # Get customer_id without committing
+        index_customer_search(db, db_customer)
         
         # Assign assets if provided
         if customer_data.ont_id and customer_data.router_id:
@@ -569,6 +1042,10 @@ def reclaim_customer_assets(db: Session, customer_id: int):
         })
     
     # Update customer status
+    record_status_events(
+        db, [customer_id], 'Inactive', {customer_id: customer.status},
+        {customer_id: len(reclaimed_assets)}
+    )
     customer.status = 'Inactive'
     
     # Update splitter used ports if applicable
@@ -650,4 +1127,834 @@ def get_assets_due_for_maintenance(db: Session, days_threshold: int = 365):
         models.Asset.status == 'Assigned'
     ).all()
     
-    return assets
\ No newline at end of file
+    return assets
+
+# Dashboard Aggregates
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def get_asset_counts(db: Session):
+    Asset = models.Asset
+    row = db.query(
+        func.count(Asset.asset_id).label("total_assets"),
+        _count_if(Asset.status == 'Available').label("available_assets"),
+        _count_if(Asset.status == 'Assigned').label("assigned_assets"),
+        _count_if(Asset.status == 'Faulty').label("faulty_assets")
+    ).one()
+    return {key: int(value) for key, value in row._mapping.items()}
+
+def get_customer_counts(db: Session):
+    Customer = models.Customer
+    row = db.query(
+        func.count(Customer.customer_id).label("total_customers"),
+        _count_if(Customer.status == 'Active').label("active_customers"),
+        _count_if(Customer.status == 'Pending').label("pending_customers")
+    ).filter(Customer.deleted_at.is_(None)).one()
+    return {key: int(value) for key, value in row._mapping.items()}
+
+def get_task_counts(db: Session):
+    Task = models.DeploymentTask
+    row = db.query(
+        func.count(Task.task_id).label("total_tasks"),
+        _count_if(Task.status.in_(['Scheduled', 'InProgress'])).label("pending_tasks"),
+        _count_if(Task.status == 'Completed').label("completed_tasks")
+    ).one()
+    return {key: int(value) for key, value in row._mapping.items()}
+
+def get_admin_stats(db: Session):
+    """Asset, customer and task counters with one conditional-aggregate query per table"""
+    return {**get_asset_counts(db), **get_customer_counts(db), **get_task_counts(db)}
+
+def get_recent_deactivations(db: Session, limit: int = 10):
+    """Latest deactivation events of live customers, newest first (to_status, created_at index)"""
+    Event = models.CustomerStatusEvent
+    rows = db.query(
+        Event.event_id, Event.customer_id, models.Customer.name, Event.from_status,
+        Event.created_at, Event.reclaimed_assets, Event.reason
+    ).join(
+        models.Customer, Event.customer_id == models.Customer.customer_id
+    ).filter(
+        Event.to_status == 'Inactive',
+        models.Customer.deleted_at.is_(None)
+    ).order_by(Event.created_at.desc(), Event.event_id.desc()).limit(limit).all()
+    return [
+        {
+            "event_id": row.event_id,
+            "customer_id": row.customer_id,
+            "name": row.name,
+            "previous_status": row.from_status,
+            "deactivation_date": row.created_at,
+            "reclaimed_assets": row.reclaimed_assets,
+            "reason": row.reason
+        }
+        for row in rows
+    ]
+
+def get_deactivation_counts(db: Session, since: datetime):
+    """Deactivations and devices reclaimed by them since a point in time"""
+    Event = models.CustomerStatusEvent
+    row = db.query(
+        func.count(Event.event_id).label("deactivations"),
+        func.coalesce(func.sum(Event.reclaimed_assets), 0).label("reclaimed_assets")
+    ).filter(Event.to_status == 'Inactive', Event.created_at >= since).one()
+    return {"deactivations": int(row.deactivations), "reclaimed_assets": int(row.reclaimed_assets)}
+
+def get_fdh_utilization(db: Session, region: Optional[str] = None, skip: int = 0, limit: int = 100):
+    """
+    One page of per-FDH port utilization plus network-wide (or region-wide)
+    port totals, from a single FDH/Splitter GROUP BY. Totals come from
+    window functions over the grouped rows, so paging does not change them.
+    """
+    FDH, Splitter = models.FDH, models.Splitter
+    capacity = func.coalesce(func.sum(Splitter.port_capacity), 0)
+    used = func.coalesce(func.sum(Splitter.used_ports), 0)
+    splitters = func.count(Splitter.splitter_id)
+    
+    def grouped(offset, page_limit):
+        query = db.query(
+            FDH.fdh_id, FDH.name, FDH.location, FDH.region,
+            splitters.label("splitters"),
+            capacity.label("total_capacity"),
+            used.label("used_ports"),
+            func.count().over().label("fdh_total"),
+            func.sum(splitters).over().label("all_splitters"),
+            func.sum(capacity).over().label("all_capacity"),
+            func.sum(used).over().label("all_used")
+        ).outerjoin(Splitter, Splitter.fdh_id == FDH.fdh_id)
+        if region:
+            query = query.filter(FDH.region == region)
+        return query.group_by(
+            FDH.fdh_id, FDH.name, FDH.location, FDH.region
+        ).order_by(FDH.fdh_id).offset(offset).limit(page_limit).all()
+    
+    rows = grouped(skip, limit)
+    totals_row = rows[0] if rows else None
+    if totals_row is None and skip:
+        # Page is past the end; fetch the first row only for the totals
+        first = grouped(0, 1)
+        totals_row = first[0] if first else None
+    
+    fdhs = [
+        {
+            "fdh_id": row.fdh_id,
+            "name": row.name,
+            "location": row.location,
+            "region": row.region,
+            "splitters": row.splitters,
+            "total_capacity": int(row.total_capacity),
+            "used_ports": int(row.used_ports),
+            "utilization_percent": round(row.used_ports / row.total_capacity * 100, 2) if row.total_capacity else 0
+        }
+        for row in rows
+    ]
+    total_capacity = int(totals_row.all_capacity or 0) if totals_row else 0
+    total_used = int(totals_row.all_used or 0) if totals_row else 0
+    summary = {
+        "total_splitters": int(totals_row.all_splitters or 0) if totals_row else 0,
+        "total_capacity": total_capacity,
+        "total_used": total_used,
+        "total_available": total_capacity - total_used
+    }
+    return (totals_row.fdh_total if totals_row else 0), fdhs, summary
+
+def get_system_counts(db: Session):
+    """Row counts of the small reference tables in one round trip"""
+    counts = db.query(
+        select(func.count(models.User.user_id)).scalar_subquery().label("total_users"),
+        select(func.count(models.Technician.technician_id)).scalar_subquery().label("total_technicians"),
+        select(func.count(models.FDH.fdh_id)).scalar_subquery().label("total_fdhs"),
+        select(func.count(models.Splitter.splitter_id)).scalar_subquery().label("total_splitters")
+    ).one()
+    return dict(counts._mapping)
+
+# Deployment Task Listings
+TASK_SUMMARY_COLUMNS = (
+    models.DeploymentTask.task_id,
+    models.DeploymentTask.customer_id,
+    models.DeploymentTask.technician_id,
+    models.DeploymentTask.status,
+    models.DeploymentTask.scheduled_date,
+    models.DeploymentTask.overdue_since,
+    models.DeploymentTask.created_at,
+    models.DeploymentTask.updated_at,
+)
+
+CUSTOMER_SUMMARY_COLUMNS = (
+    models.Customer.name,
+    models.Customer.address,
+    models.Customer.neighborhood,
+    models.Customer.status.label("customer_status"),
+)
+
+TECHNICIAN_SUMMARY_COLUMNS = (
+    models.Technician.technician_id.label("tech_id"),
+    models.Technician.name.label("tech_name"),
+    models.Technician.contact.label("tech_contact"),
+    models.Technician.region.label("tech_region"),
+)
+
+def _task_list_item(row, include_technician: bool = False):
+    item = {
+        "task": {
+            "task_id": row.task_id,
+            "customer_id": row.customer_id,
+            "technician_id": row.technician_id,
+            "status": row.status,
+            "scheduled_date": row.scheduled_date,
+            "overdue_since": row.overdue_since,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at
+        },
+        "customer": {
+            "customer_id": row.customer_id,
+            "name": row.name,
+            "address": row.address,
+            "neighborhood": row.neighborhood,
+            "status": row.customer_status
+        }
+    }
+    if include_technician:
+        item["technician"] = {
+            "technician_id": row.tech_id,
+            "name": row.tech_name,
+            "contact": row.tech_contact,
+            "region": row.tech_region
+        }
+    return item
+
+def _task_filters(status=None, date_from=None, date_to=None):
+    filters = []
+    if status:
+        filters.append(models.DeploymentTask.status == status)
+    if date_from:
+        filters.append(models.DeploymentTask.scheduled_date >= date_from)
+    if date_to:
+        filters.append(models.DeploymentTask.scheduled_date <= date_to)
+    return filters
+
+def get_technician_task_list(
+    db: Session,
+    technician_id: int,
+    status: Optional[str] = None,
+    date_from=None,
+    date_to=None
+):
+    """Tasks for a technician joined with compact customer info in one query"""
+    rows = db.query(*TASK_SUMMARY_COLUMNS, *CUSTOMER_SUMMARY_COLUMNS).join(
+        models.Customer, models.DeploymentTask.customer_id == models.Customer.customer_id
+    ).filter(
+        models.DeploymentTask.technician_id == technician_id,
+        models.Customer.deleted_at.is_(None),
+        *_task_filters(status, date_from, date_to)
+    ).order_by(models.DeploymentTask.scheduled_date, models.DeploymentTask.task_id).all()
+    return [_task_list_item(row) for row in rows]
+
+def get_user_task_list(
+    db: Session,
+    user_id: int,
+    status: Optional[str] = None,
+    date_from=None,
+    date_to=None
+):
+    """
+    Tasks for the technician linked to a user, resolved in the same query.
+    Returns None when the user has no technician profile.
+    """
+    rows = db.query(
+        *TECHNICIAN_SUMMARY_COLUMNS, *TASK_SUMMARY_COLUMNS, *CUSTOMER_SUMMARY_COLUMNS
+    ).select_from(models.Technician).outerjoin(
+        models.DeploymentTask, and_(
+            models.DeploymentTask.technician_id == models.Technician.technician_id,
+            *_task_filters(status, date_from, date_to)
+        )
+    ).outerjoin(
+        models.Customer, and_(
+            models.DeploymentTask.customer_id == models.Customer.customer_id,
+            models.Customer.deleted_at.is_(None)
+        )
+    ).filter(
+        models.Technician.user_id == user_id
+    ).order_by(models.DeploymentTask.scheduled_date, models.DeploymentTask.task_id).all()
+    
+    if not rows:
+        return None
+    return [
+        _task_list_item(row, include_technician=True)
+        for row in rows
+        if row.task_id is not None and row.name is not None
+    ]
+
+def get_technician_dashboard_tasks(
+    db: Session,
+    technician_id: Optional[int],
+    since: datetime,
+    pending_limit: int = 5,
+    completions_limit: int = 10
+):
+    """
+    A technician's open tasks, unassigned Scheduled tasks and completions
+    since `since`, from one query: rows are tagged with a CASE bucket and
+    the capped buckets are cut with ROW_NUMBER() per bucket.
+    """
+    Task = models.DeploymentTask
+    mine = and_(Task.technician_id == technician_id, Task.status.in_(['Scheduled', 'InProgress']))
+    pending = and_(Task.technician_id.is_(None), Task.status == 'Scheduled')
+    completed = and_(Task.technician_id == technician_id, Task.status == 'Completed', Task.updated_at >= since)
+    
+    buckets = [(pending, 'pending')]
+    if technician_id is not None:
+        buckets = [(mine, 'mine'), (completed, 'completed')] + buckets
+    bucket = case(*buckets).label("bucket")
+    
+    ranked = db.query(
+        Task,
+        bucket,
+        func.row_number().over(
+            partition_by=bucket, order_by=(Task.updated_at.desc(), Task.task_id)
+        ).label("position")
+    ).filter(or_(*(condition for condition, _ in buckets))).subquery()
+    
+    task = aliased(Task, ranked)
+    rows = db.query(task, ranked.c.bucket).filter(or_(
+        ranked.c.bucket == 'mine',
+        and_(ranked.c.bucket == 'pending', ranked.c.position <= pending_limit),
+        and_(ranked.c.bucket == 'completed', ranked.c.position <= completions_limit)
+    )).order_by(ranked.c.bucket, ranked.c.position).all()
+    
+    result = {"mine": [], "pending": [], "completed": []}
+    for row_task, row_bucket in rows:
+        result[row_bucket].append(row_task)
+    return result
+
+# Bulk Task Creation
+OPEN_TASK_STATUSES = ['Scheduled', 'InProgress']
+
+def find_customers_without_open_task(
+    db: Session,
+    customer_ids: Optional[List[int]] = None,
+    neighborhood: Optional[str] = None,
+    splitter_id: Optional[int] = None
+):
+    """IDs of live Pending customers matching the criteria that have no Scheduled/InProgress task"""
+    open_task = db.query(models.DeploymentTask.task_id).filter(
+        models.DeploymentTask.customer_id == models.Customer.customer_id,
+        models.DeploymentTask.status.in_(OPEN_TASK_STATUSES)
+    ).exists()
+    query = live_customers(db).with_entities(models.Customer.customer_id).filter(
+        models.Customer.status == 'Pending',
+        ~open_task
+    )
+    if customer_ids is not None:
+        query = query.filter(models.Customer.customer_id.in_(customer_ids))
+    if neighborhood:
+        query = query.filter(models.Customer.neighborhood == neighborhood)
+    if splitter_id:
+        query = query.filter(models.Customer.splitter_id == splitter_id)
+    return [customer_id for (customer_id,) in query.order_by(models.Customer.created_at).all()]
+
+def bulk_create_tasks(
+    db: Session,
+    customer_ids: List[int],
+    technician_id: Optional[int] = None,
+    scheduled_date=None,
+    notes: Optional[str] = None,
+    batch_size: int = 1000
+):
+    """
+    Insert one Scheduled task per customer, flushed a batch at a time.
+    Returns {customer_id: task_id} for the new tasks.
+    """
+    if not customer_ids:
+        return {}
+    now = datetime.utcnow()
+    created = {}
+    try:
+        for i in range(0, len(customer_ids), batch_size):
+            chunk = customer_ids[i:i + batch_size]
+            # Ids come from the flush itself (batched INSERT .. RETURNING where the
+            # driver supports it), never from a range that concurrent inserts can enter
+            tasks = [
+                models.DeploymentTask(
+                    customer_id=customer_id,
+                    technician_id=technician_id,
+                    status='Scheduled',
+                    scheduled_date=scheduled_date,
+                    created_at=now,
+                    updated_at=now
+                )
+                for customer_id in chunk
+            ]
+            db.add_all(tasks)
+            db.flush()
+            created.update((task.customer_id, task.task_id) for task in tasks)
+        
+        if notes and created:
+            db.execute(insert(models.TaskNote), [
+                {"task_id": task_id, "body": notes, "created_at": now}
+                for task_id in created.values()
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return created
+
+def get_task_event_context(db: Session, task_ids: List[int]):
+    """{task_id: row(task_id, customer_id, technician_id, status, scheduled_date, region)} in one query"""
+    if not task_ids:
+        return {}
+    rows = db.query(
+        models.DeploymentTask.task_id,
+        models.DeploymentTask.customer_id,
+        models.DeploymentTask.technician_id,
+        models.DeploymentTask.status,
+        models.DeploymentTask.scheduled_date,
+        models.FDH.region
+    ).join(
+        models.Customer, models.DeploymentTask.customer_id == models.Customer.customer_id
+    ).outerjoin(
+        models.Splitter, models.Customer.splitter_id == models.Splitter.splitter_id
+    ).outerjoin(
+        models.FDH, models.Splitter.fdh_id == models.FDH.fdh_id
+    ).filter(models.DeploymentTask.task_id.in_(task_ids)).all()
+    return {row.task_id: row for row in rows}
+
+# Task Status Transitions
+def set_task_status(db: Session, task: models.DeploymentTask, status: str, at: Optional[datetime] = None):
+    """
+    Move a task to a new status and apply its side effects: completion time,
+    daily rollups and customer activation on completion. The caller commits.
+    """
+    at = at or datetime.utcnow()
+    old_status = task.status
+    task.updated_at = at
+    if status == old_status:
+        return
+    
+    rollups.record_transition(db, task, old_status, status, at)
+    task.status = status
+    task.completed_at = at if status in rollups.TERMINAL_STATUSES else None
+    if status not in OVERDUE_STATUSES:
+        task.overdue_since = None
+    
+    if status == "Completed":
+        customer = get_customer(db, task.customer_id)
+        if customer:
+            record_status_events(db, [customer.customer_id], "Active", {customer.customer_id: customer.status})
+            customer.status = "Active"
+
+# Overdue Tasks
+OVERDUE_STATUSES = ['Scheduled']
+
+def sweep_overdue_tasks(db: Session, today=None, batch_size: int = 1000):
+    """
+    Flag Scheduled tasks whose scheduled_date has passed and clear flags on
+    tasks that were resolved, rescheduled or whose customer was soft-deleted.
+    Both passes are index range scans (status, scheduled_date) /
+    (overdue_since); updated_at is left alone. Scheduled dates are compared
+    with date.today(), as elsewhere. Returns the newly flagged and cleared
+    task ids.
+    """
+    today = today or date.today()
+    now = datetime.utcnow()
+    Task = models.DeploymentTask
+    Customer = models.Customer
+    
+    newly_overdue = [row.task_id for row in db.query(Task.task_id).join(
+        Customer, Task.customer_id == Customer.customer_id
+    ).filter(
+        Task.status.in_(OVERDUE_STATUSES),
+        Task.scheduled_date < today,
+        Task.overdue_since.is_(None),
+        Customer.deleted_at.is_(None)
+    )]
+    resolved = [row.task_id for row in db.query(Task.task_id).join(
+        Customer, Task.customer_id == Customer.customer_id
+    ).filter(
+        Task.overdue_since.isnot(None)
+    ).filter(
+        (Task.status.notin_(OVERDUE_STATUSES)) | (Task.scheduled_date >= today) | (Task.scheduled_date.is_(None))
+        | (Customer.deleted_at.isnot(None))
+    )]
+    
+    for ids, value in ((newly_overdue, now), (resolved, None)):
+        for start in range(0, len(ids), batch_size):
+            db.execute(
+                update(Task)
+                .where(Task.task_id.in_(ids[start:start + batch_size]))
+                .values(overdue_since=value, updated_at=Task.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+    return {"flagged": newly_overdue, "cleared": resolved}
+
+def get_overdue_task_list(
+    db: Session,
+    technician_id: Optional[int] = None,
+    region: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+):
+    """Flagged overdue tasks, oldest scheduled first, with the total count"""
+    Task = models.DeploymentTask
+    query = db.query(Task).join(
+        models.Customer, Task.customer_id == models.Customer.customer_id
+    ).filter(Task.overdue_since.isnot(None), models.Customer.deleted_at.is_(None))
+    if technician_id is not None:
+        query = query.filter(Task.technician_id == technician_id)
+    if region:
+        query = query.join(
+            models.Splitter, models.Customer.splitter_id == models.Splitter.splitter_id
+        ).join(
+            models.FDH, models.Splitter.fdh_id == models.FDH.fdh_id
+        ).filter(models.FDH.region == region)
+    
+    total = query.count()
+    rows = query.with_entities(*TASK_SUMMARY_COLUMNS, *CUSTOMER_SUMMARY_COLUMNS).order_by(
+        Task.scheduled_date, Task.task_id
+    ).offset(skip).limit(limit).all()
+    return total, [_task_list_item(row) for row in rows]
+
+def count_overdue_tasks(db: Session, technician_id: Optional[int] = None) -> int:
+    query = db.query(func.count(models.DeploymentTask.task_id)).join(
+        models.Customer, models.DeploymentTask.customer_id == models.Customer.customer_id
+    ).filter(
+        models.DeploymentTask.overdue_since.isnot(None),
+        models.Customer.deleted_at.is_(None)
+    )
+    if technician_id is not None:
+        query = query.filter(models.DeploymentTask.technician_id == technician_id)
+    return query.scalar()
+
+# Task Notes
+def add_task_note(db: Session, task_id: int, body: str, status: Optional[str] = None):
+    """Append a note to a task (caller commits)"""
+    note = models.TaskNote(task_id=task_id, body=body, status=status, created_at=datetime.utcnow())
+    db.add(note)
+    return note
+
+def get_task_notes(db: Session, task_id: int, skip: int = 0, limit: int = 20):
+    """Newest-first page of notes for a task"""
+    return db.query(models.TaskNote).filter(
+        models.TaskNote.task_id == task_id
+    ).order_by(
+        models.TaskNote.created_at.desc(), models.TaskNote.note_id.desc()
+    ).offset(skip).limit(limit).all()
+
+def get_task_details(db: Session, task_id: int):
+    """Task with customer, assets, splitter, FDH and technician from one joined query"""
+    rows = db.query(
+        models.DeploymentTask, models.Customer, models.Splitter, models.FDH, models.Technician, models.Asset
+    ).select_from(models.DeploymentTask).join(
+        models.Customer, models.DeploymentTask.customer_id == models.Customer.customer_id
+    ).outerjoin(
+        models.Splitter, models.Customer.splitter_id == models.Splitter.splitter_id
+    ).outerjoin(
+        models.FDH, models.Splitter.fdh_id == models.FDH.fdh_id
+    ).outerjoin(
+        models.Technician, models.DeploymentTask.technician_id == models.Technician.technician_id
+    ).outerjoin(
+        models.AssignedAssets, models.AssignedAssets.customer_id == models.Customer.customer_id
+    ).outerjoin(
+        models.Asset, models.AssignedAssets.asset_id == models.Asset.asset_id
+    ).filter(
+        models.DeploymentTask.task_id == task_id,
+        models.Customer.deleted_at.is_(None)
+    ).all()
+    
+    if not rows:
+        return None
+    task, customer, splitter, fdh, technician, _ = rows[0]
+    return {
+        "task": task,
+        "customer": customer,
+        "assets": [row[-1] for row in rows if row[-1] is not None],
+        "splitter": splitter,
+        "fdh": fdh,
+        "technician": technician
+    }
+
+# Technician Offline Bundle
+def get_technician_bundle(
+    db: Session,
+    technician_id: int,
+    day,
+    include_overdue: bool = True,
+    notes_per_task: int = 20
+):
+    """
+    Everything a technician needs for a day's tasks, loaded with one batched
+    query per entity type regardless of how many tasks there are.
+    """
+    Task = models.DeploymentTask
+    day_filter = Task.scheduled_date == day
+    if include_overdue:
+        day_filter = day_filter | Task.overdue_since.isnot(None)
+    
+    tasks = db.query(Task).join(
+        models.Customer, Task.customer_id == models.Customer.customer_id
+    ).filter(
+        Task.technician_id == technician_id,
+        Task.status.in_(OPEN_TASK_STATUSES),
+        models.Customer.deleted_at.is_(None),
+        day_filter
+    ).order_by(Task.scheduled_date, Task.task_id).all()
+    
+    bundle = {
+        "tasks": tasks, "customers": [], "assets": [], "fiber_lines": [],
+        "splitters": [], "fdhs": [], "headends": [], "ports": [], "notes": []
+    }
+    if not tasks:
+        return bundle
+    
+    task_ids = [t.task_id for t in tasks]
+    customer_ids = sorted({t.customer_id for t in tasks})
+    bundle["customers"] = live_customers(db).filter(models.Customer.customer_id.in_(customer_ids)).all()
+    
+    bundle["assets"] = db.query(models.AssignedAssets.customer_id, models.Asset).join(
+        models.Asset, models.AssignedAssets.asset_id == models.Asset.asset_id
+    ).filter(models.AssignedAssets.customer_id.in_(customer_ids)).all()
+    
+    bundle["fiber_lines"] = db.query(models.FiberDropLine).filter(
+        models.FiberDropLine.to_customer_id.in_(customer_ids)
+    ).all()
+    
+    splitter_ids = sorted({c.splitter_id for c in bundle["customers"] if c.splitter_id})
+    if splitter_ids:
+        bundle["splitters"] = db.query(models.Splitter).filter(
+            models.Splitter.splitter_id.in_(splitter_ids)
+        ).all()
+        fdh_ids = sorted({s.fdh_id for s in bundle["splitters"]})
+        bundle["fdhs"] = db.query(models.FDH).filter(models.FDH.fdh_id.in_(fdh_ids)).all()
+        headend_ids = sorted({f.headend_id for f in bundle["fdhs"] if f.headend_id})
+        if headend_ids:
+            bundle["headends"] = db.query(models.Headend).filter(
+                models.Headend.headend_id.in_(headend_ids)
+            ).all()
+        bundle["ports"] = live_customers(db).with_entities(
+            models.Customer.splitter_id, models.Customer.assigned_port, models.Customer.customer_id
+        ).filter(
+            models.Customer.splitter_id.in_(splitter_ids),
+            models.Customer.status.in_(['Active', 'Pending']),
+            models.Customer.assigned_port.isnot(None)
+        ).order_by(models.Customer.splitter_id, models.Customer.assigned_port).all()
+    
+    notes = db.query(models.TaskNote).filter(
+        models.TaskNote.task_id.in_(task_ids)
+    ).order_by(models.TaskNote.task_id, models.TaskNote.created_at.desc(), models.TaskNote.note_id.desc()).all()
+    kept = {}
+    for note in notes:
+        if kept.get(note.task_id, 0) < notes_per_task:
+            kept[note.task_id] = kept.get(note.task_id, 0) + 1
+            bundle["notes"].append(note)
+    
+    return bundle
+
+# Delta Sync
+SYNC_EDITABLE_FIELDS = {
+    "task": {"status", "scheduled_date", "notes"},
+    "customer": {"address", "latitude", "longitude"},
+}
+
+def record_tombstones(db: Session, entity: str, ids: List[int], technician_id: Optional[int] = None):
+    """Record deleted rows (or rows leaving a technician's scope) for delta sync; caller commits"""
+    if ids:
+        db.execute(insert(models.SyncTombstone), [
+            {"entity": entity, "entity_id": entity_id, "technician_id": technician_id}
+            for entity_id in ids
+        ])
+
+# Unfinished versions older than this are treated as abandoned (e.g. a crashed writer)
+SYNC_VERSION_TIMEOUT_SECONDS = int(os.getenv("SYNC_VERSION_TIMEOUT_SECONDS", "600"))
+
+def get_sync_token(db: Session) -> int:
+    """Highest row version below which every writing transaction has finished"""
+    Version = models.SyncVersion
+    cutoff = datetime.utcnow() - timedelta(seconds=SYNC_VERSION_TIMEOUT_SECONDS)
+    oldest_open = db.query(func.min(Version.version_id)).filter(
+        Version.finished.is_(False), Version.allocated_at > cutoff
+    ).scalar()
+    if oldest_open is not None:
+        return oldest_open - 1
+    return db.query(func.max(Version.version_id)).scalar() or 0
+
+def _version_window(query, column, since: int, upto: int):
+    return query.filter(column > since, column <= upto)
+
+def _at_version(query, column, version: int):
+    # Rows written before versioning have no version; they are served as version 0
+    return query.filter(column.is_(None) if version == 0 else column == version)
+
+def parse_sync_cursor(cursor: str):
+    """'<version>:<task id>:<customer id>:<asset id>:<tombstone id>' -> (version, positions)"""
+    parts = [int(part) for part in cursor.split(":")]
+    if len(parts) != 5 or parts[0] < 0:
+        raise ValueError("Malformed sync cursor")
+    return parts[0], parts[1:]
+
+def get_sync_changes(
+    db: Session,
+    since: Optional[int] = None,
+    technician_id: Optional[int] = None,
+    limit: int = 500,
+    cursor: Optional[str] = None
+):
+    """
+    Rows and tombstones with a version in (since, token]. When a page is
+    cut, token is lowered so every row at or below it is included and the
+    client can resume from it. A version holding more than a page (and the
+    unversioned rows of an initial sync, served first as version 0) is paged
+    by primary key: the response then keeps token at `since` and returns a
+    cursor to pass back with it.
+    """
+    Task, Customer, Asset, Tombstone = models.DeploymentTask, models.Customer, models.Asset, models.SyncTombstone
+    
+    tasks = db.query(Task)
+    customers = db.query(Customer).filter(Customer.deleted_at.is_(None))
+    assets = db.query(Asset)
+    tombstones = db.query(Tombstone)
+    if technician_id is not None:
+        scope = select(Task.customer_id).where(Task.technician_id == technician_id)
+        tasks = tasks.filter(Task.technician_id == technician_id)
+        customers = customers.filter(Customer.customer_id.in_(scope))
+        assets = assets.filter(Asset.assigned_to_customer_id.in_(scope))
+        tombstones = tombstones.filter(or_(Tombstone.technician_id.is_(None), Tombstone.technician_id == technician_id))
+    
+    sources = {
+        "tasks": (tasks, Task.row_version, Task.task_id),
+        "customers": (customers, Customer.row_version, Customer.customer_id),
+        "assets": (assets, Asset.row_version, Asset.asset_id),
+        "tombstones": (tombstones, Tombstone.row_version, Tombstone.tombstone_id),
+    }
+    token = get_sync_token(db)
+    
+    def version_page(version, positions):
+        """One page of the rows at a single version, by primary key from positions"""
+        results, ends, more = {}, [], False
+        for (name, (query, column, pk)), after in zip(sources.items(), positions):
+            rows = _at_version(query, column, version).filter(pk > after).order_by(pk).limit(limit + 1).all()
+            more = more or len(rows) > limit
+            results[name] = rows[:limit]
+            ends.append(getattr(results[name][-1], pk.key) if results[name] else after)
+        if more:
+            return results, since, True, ":".join(str(value) for value in (version, *ends))
+        return results, version, version < token, None
+    
+    if cursor is not None:
+        results, upto, has_more, next_cursor = version_page(*parse_sync_cursor(cursor))
+    else:
+        results = None
+        if since is None:
+            results, upto, has_more, next_cursor = version_page(0, [0] * len(sources))
+            if not any(results.values()):
+                results, since = None, 0
+        if results is None:
+            upto, next_cursor = token, None
+            results = {
+                name: _version_window(query, column, since, upto).order_by(column, pk).limit(limit + 1).all()
+                for name, (query, column, pk) in sources.items()
+            }
+            truncated = [rows for rows in results.values() if len(rows) > limit]
+            cut = min((rows[limit].row_version for rows in truncated), default=None)
+            if cut is not None and cut - 1 <= since:
+                # The next version alone holds more than a page
+                results, upto, has_more, next_cursor = version_page(cut, [0] * len(sources))
+            else:
+                if cut is not None:
+                    upto = cut - 1
+                    results = {name: [row for row in rows if row.row_version <= upto] for name, rows in results.items()}
+                has_more = upto < token
+    
+    if technician_id is not None:
+        # Tasks newly in scope bring their customers and devices even if those rows did not change
+        known = {c.customer_id for c in results["customers"]}
+        entering = sorted({t.customer_id for t in results["tasks"]} - known)
+        if entering:
+            results["customers"] += customers.filter(Customer.customer_id.in_(entering)).all()
+            known_assets = {a.asset_id for a in results["assets"]}
+            results["assets"] += [
+                a for a in assets.filter(Asset.assigned_to_customer_id.in_(entering)).all()
+                if a.asset_id not in known_assets
+            ]
+    
+    return {"token": upto, "has_more": has_more, "cursor": next_cursor, **results}
+
+def apply_sync_changes(db: Session, changes, technician_id: Optional[int] = None):
+    """
+    Apply a batch of offline edits. A change whose base_version no longer
+    matches the row is reported as a conflict with the server copy; notes
+    are append-only and are kept even then. Commits once for the batch.
+    """
+    valid_statuses = {'Scheduled', 'InProgress', 'Completed', 'Failed'}
+    results = []
+    
+    for change in changes:
+        result = {"entity": change.entity, "id": change.id}
+        results.append(result)
+        
+        fields = dict(change.fields)
+        invalid = set(fields) - SYNC_EDITABLE_FIELDS[change.entity]
+        if invalid:
+            result.update(status="rejected", detail=f"Fields not editable offline: {', '.join(sorted(invalid))}")
+            continue
+        
+        if change.entity == "task":
+            obj = db.query(models.DeploymentTask).filter(models.DeploymentTask.task_id == change.id).first()
+            if obj is not None and technician_id is not None and obj.technician_id != technician_id:
+                result.update(status="rejected", detail="Task is not assigned to this technician")
+                continue
+        else:
+            obj = live_customers(db).filter(models.Customer.customer_id == change.id).first()
+            if obj is not None and technician_id is not None and not db.query(
+                db.query(models.DeploymentTask.task_id).filter(
+                    models.DeploymentTask.customer_id == change.id,
+                    models.DeploymentTask.technician_id == technician_id,
+                    models.DeploymentTask.status.in_(OPEN_TASK_STATUSES)
+                ).exists()
+            ).scalar():
+                result.update(status="rejected", detail="Customer has no open task for this technician")
+                continue
+        if obj is None:
+            result.update(status="not_found")
+            continue
+        
+        note = fields.pop("notes", None)
+        if "status" in fields and fields["status"] not in valid_statuses:
+            result.update(status="rejected", detail=f"Invalid status {fields['status']}")
+            continue
+        if fields.get("scheduled_date"):
+            try:
+                fields["scheduled_date"] = date.fromisoformat(str(fields["scheduled_date"]))
+            except ValueError:
+                result.update(status="rejected", detail="scheduled_date must be YYYY-MM-DD")
+                continue
+        
+        conflict = bool(fields) and change.base_version is not None and obj.row_version != change.base_version
+        if conflict:
+            result.update(status="conflict")
+        else:
+            if change.entity == "task":
+                if "scheduled_date" in fields:
+                    obj.scheduled_date = fields["scheduled_date"]
+                set_task_status(db, obj, fields.get("status", obj.status))
+            else:
+                for key, value in fields.items():
+                    setattr(obj, key, value)
+                if "address" in fields:
+                    index_customer_search(db, obj)
+            result.update(status="applied")
+        
+        if note:
+            add_task_note(db, obj.task_id, note, None if conflict else fields.get("status"))
+            obj.updated_at = datetime.utcnow()
+            result["note_added"] = True
+        
+        # Flush per change so later edits in the batch see the new row_version
+        db.flush()
+        result["row_version"] = obj.row_version
+        if conflict:
+            schema = schemas.DeploymentTask if change.entity == "task" else schemas.Customer
+            result["server"] = schema.model_validate(obj)
+    
+    db.commit()
+    return results
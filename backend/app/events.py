@@ -0,0 +1,110 @@
+"""
+In-process publish/subscribe for change events.
+
+Write paths publish from worker threads (sync endpoints run in a threadpool).
+Async consumers such as WebSocket handlers get events on an asyncio.Queue
+bound to their own event loop; synchronous listeners are called inline.
+"""
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from itertools import chain
+from typing import Callable, Iterable, Optional
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    def __init__(self, topics: Iterable[str], predicate: Optional[Callable[[dict], bool]], maxsize: int):
+        self.topics = set(topics)
+        self.predicate = predicate
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+    
+    def wants(self, event: dict) -> bool:
+        return event["topic"] in self.topics and (self.predicate is None or self.predicate(event))
+    
+    def _deliver(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping %s event for a slow subscriber", event["topic"])
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._listeners = defaultdict(list)
+    
+    def subscribe(self, topics: Iterable[str], predicate: Optional[Callable[[dict], bool]] = None, maxsize: int = 1000) -> Subscription:
+        """Subscribe the calling event loop to one or more topics"""
+        subscription = Subscription(topics, predicate, maxsize)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+    
+    def add_listener(self, topic: str, callback: Callable[[dict], None]):
+        """Register a synchronous callback, run in the publishing thread"""
+        with self._lock:
+            self._listeners[topic].append(callback)
+    
+    def publish(self, topic: str, payload: dict):
+        event = {"topic": topic, "timestamp": datetime.utcnow(), **payload}
+        with self._lock:
+            listeners = list(self._listeners[topic])
+            subscriptions = list(self._subscriptions)
+        
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Event listener failed for %s", topic)
+        
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+                except RuntimeError:
+                    # Subscriber's loop has closed
+                    self.unsubscribe(subscription)
+
+bus = EventBus()
+
+def publish_table_changes(session_factory):
+    """
+    Publish {"tables": [...]} on the "db" topic after every commit that
+    wrote rows, covering unit-of-work flushes and bulk INSERT/UPDATE/DELETE.
+    """
+    def changed(session) -> set:
+        return session.info.setdefault("changed_tables", set())
+    
+    @event.listens_for(session_factory, "after_flush")
+    def track_flush(session, flush_context):
+        for obj in chain(session.new, session.dirty, session.deleted):
+            table = getattr(obj, "__tablename__", None)
+            if table:
+                changed(session).add(table)
+    
+    @event.listens_for(session_factory, "do_orm_execute")
+    def track_bulk(state):
+        if state.is_insert or state.is_update or state.is_delete:
+            table = getattr(state.statement, "table", None)
+            if table is not None:
+                changed(state.session).add(table.name)
+    
+    @event.listens_for(session_factory, "after_commit")
+    def publish(session):
+        tables = session.info.pop("changed_tables", None)
+        if tables:
+            bus.publish("db", {"tables": sorted(tables)})
+    
+    @event.listens_for(session_factory, "after_rollback")
+    def discard(session):
+        session.info.pop("changed_tables", None)
@@ -0,0 +1,166 @@
+"""
+Background jobs.
+
+Each job opens its own database session, so it can be triggered from the
+in-process scheduler, from an API endpoint, or from cron:
+
+    python -m app.jobs reconcile-ports [--dry-run]
+
+Intervals are read from the environment; an interval of 0 disables the job
+in the in-process scheduler. Daily jobs run at a wall-clock time (HH:MM,
+server local time; empty disables) and catch up once at startup.
+"""
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from .database import SessionLocal
+from . import crud, models, scheduler, rollups, reports
+
+logger = logging.getLogger(__name__)
+
+def reconcile_splitter_ports(dry_run: bool = False):
+    """Recount used ports on every splitter and fix drift"""
+    db = SessionLocal()
+    try:
+        result = crud.reconcile_splitter_used_ports(db, apply=not dry_run)
+        if result["drifted_splitters"]:
+            logger.warning("Splitter port drift found on %d splitters", result["drifted_splitters"])
+        return result
+    finally:
+        db.close()
+
+def purge_deleted_customers(dry_run: bool = False, customer_ids=None):
+    """Run the delete cascade for soft-deleted customers (or just customer_ids) in bounded batches"""
+    db = SessionLocal()
+    try:
+        if dry_run:
+            pending = db.query(models.Customer).filter(models.Customer.deleted_at.isnot(None)).count()
+            return {"customers_pending_purge": pending}
+        return crud.purge_deleted_customers(db, customer_ids=customer_ids)
+    finally:
+        db.close()
+
+def auto_assign_tasks(dry_run: bool = False):
+    """Assign unassigned Scheduled tasks to technicians"""
+    db = SessionLocal()
+    try:
+        result = scheduler.auto_assign_tasks(db, dry_run=dry_run)
+        result.pop("assignments")
+        return result
+    finally:
+        db.close()
+
+def rebuild_deployment_rollups(dry_run: bool = False):
+    """Recompute deployment daily rollups from task history"""
+    db = SessionLocal()
+    try:
+        if dry_run:
+            return {"buckets": db.query(models.DeploymentDailyRollup).count()}
+        return rollups.rebuild_rollups(db)
+    finally:
+        db.close()
+
+def sweep_overdue_tasks(dry_run: bool = False):
+    """Flag tasks past their scheduled date and clear resolved flags"""
+    db = SessionLocal()
+    try:
+        if dry_run:
+            return {"overdue": crud.count_overdue_tasks(db)}
+        result = crud.sweep_overdue_tasks(db)
+        return {"flagged": len(result["flagged"]), "cleared": len(result["cleared"])}
+    finally:
+        db.close()
+
+def generate_report_snapshots(dry_run: bool = False, missing_only: bool = False):
+    """Materialize the weekly reports into snapshots (only those missing for the last period if missing_only)"""
+    db = SessionLocal()
+    try:
+        names = reports.missing_reports(db) if missing_only else list(reports.REPORTS)
+        if dry_run or not names:
+            return {"reports": names}
+        return reports.generate_snapshots(db, names, keep=int(os.getenv("REPORT_SNAPSHOTS_KEEP", "30")))
+    finally:
+        db.close()
+
+# name -> (job function, interval env var, default interval in seconds)
+JOBS = {
+    "reconcile-ports": (reconcile_splitter_ports, "RECONCILE_PORTS_INTERVAL_SECONDS", 3600),
+    "purge-deleted-customers": (purge_deleted_customers, "PURGE_DELETED_CUSTOMERS_INTERVAL_SECONDS", 300),
+    "auto-assign-tasks": (auto_assign_tasks, "AUTO_ASSIGN_TASKS_INTERVAL_SECONDS", 0),
+    "sweep-overdue-tasks": (sweep_overdue_tasks, "SWEEP_OVERDUE_TASKS_INTERVAL_SECONDS", 900),
+    "rebuild-rollups": (rebuild_deployment_rollups, "REBUILD_ROLLUPS_INTERVAL_SECONDS", 0),
+}
+
+# name -> (job function taking missing_only, time-of-day env var, default HH:MM)
+DAILY_JOBS = {
+    "generate-reports": (generate_report_snapshots, "GENERATE_REPORTS_AT", "02:00"),
+}
+
+_stop_event = threading.Event()
+_threads = []
+
+def _run_every(name: str, func, interval: int):
+    while not _stop_event.wait(interval):
+        try:
+            func()
+        except Exception:
+            logger.exception("Background job %s failed", name)
+
+def _next_run(at, now: datetime) -> datetime:
+    run = datetime.combine(now.date(), at)
+    return run if run > now else run + timedelta(days=1)
+
+def _run_daily(name: str, func, at):
+    # Catch up on a run missed while the service was down or being redeployed
+    try:
+        func(missing_only=True)
+    except Exception:
+        logger.exception("Background job %s failed", name)
+    while True:
+        now = datetime.now()
+        if _stop_event.wait((_next_run(at, now) - now).total_seconds()):
+            return
+        try:
+            func()
+        except Exception:
+            logger.exception("Background job %s failed", name)
+
+def start_scheduler():
+    """Start one daemon thread per enabled job"""
+    if os.getenv("ENABLE_JOB_SCHEDULER", "true").lower() != "true" or _threads:
+        return
+    _stop_event.clear()
+    for name, (func, env_var, default_interval) in JOBS.items():
+        interval = int(os.getenv(env_var, default_interval))
+        if interval <= 0:
+            continue
+        thread = threading.Thread(target=_run_every, args=(name, func, interval), name=f"job-{name}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+    for name, (func, env_var, default_at) in DAILY_JOBS.items():
+        value = os.getenv(env_var, default_at).strip()
+        if not value:
+            continue
+        try:
+            at = datetime.strptime(value, "%H:%M").time()
+        except ValueError:
+            logger.error("Ignoring %s=%r; expected HH:MM", env_var, value)
+            continue
+        thread = threading.Thread(target=_run_daily, args=(name, func, at), name=f"job-{name}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+def stop_scheduler():
+    _stop_event.set()
+    _threads.clear()
+
+if __name__ == "__main__":
+    all_jobs = {**JOBS, **DAILY_JOBS}
+    if len(sys.argv) < 2 or sys.argv[1] not in all_jobs:
+        print(f"Usage: python -m app.jobs <{'|'.join(all_jobs)}> [--dry-run]")
+        sys.exit(1)
+    job = all_jobs[sys.argv[1]][0]
+    kwargs = {"dry_run": True} if "--dry-run" in sys.argv[2:] else {}
+    print(job(**kwargs))
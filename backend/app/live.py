@@ -0,0 +1,123 @@
+"""
+Live views: recompute a watched payload after relevant commits and publish
+only what changed.
+
+A view is identified by (kind, scope), e.g. ("planner", "North"). While at
+least one client watches it, a background worker rebuilds it once per
+debounce window after a commit touches one of its tables, diffs it against
+the previous snapshot and publishes {"key", "delta"} on the "live" topic,
+so every connected client shares a single computation.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Tuple
+from . import events
+
+logger = logging.getLogger(__name__)
+
+def _diff_records(old: list, new: list, id_key: str):
+    """Upserted records, removed ids and the new order of a keyed list"""
+    old_by_id = {item[id_key]: item for item in old}
+    new_ids = [item[id_key] for item in new]
+    upserted = [item for item in new if old_by_id.get(item[id_key]) != item]
+    removed = [item_id for item_id in old_by_id if item_id not in set(new_ids)]
+    return {"upserted": upserted, "removed": removed, "order": new_ids}
+
+def diff(old: dict, new: dict, keys: Dict[str, str] = None) -> dict:
+    """
+    Changed top-level entries of a payload: changed keys for dicts, record
+    changes for lists named in `keys` (list name -> id field), otherwise the
+    whole new value.
+    """
+    keys = keys or {}
+    delta = {}
+    for name, value in new.items():
+        before = old.get(name)
+        if before == value:
+            continue
+        if isinstance(value, dict) and isinstance(before, dict):
+            delta[name] = {k: v for k, v in value.items() if before.get(k) != v}
+        elif name in keys and isinstance(before, list):
+            delta[name] = _diff_records(before, value, keys[name])
+        else:
+            delta[name] = value
+    return delta
+
+class LiveViews:
+    def __init__(self, debounce: float = 0.5):
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._builders: Dict[str, Tuple[frozenset, Callable, dict]] = {}
+        self._watchers: Dict[Hashable, int] = {}
+        self._snapshots: Dict[Hashable, dict] = {}
+        self._dirty = set()
+        self._wake = threading.Event()
+        self._worker = None
+        events.bus.add_listener("db", self._on_commit)
+
+    def register(self, kind: str, tables: Iterable[str], build: Callable[[Hashable], dict], keys: Dict[str, str] = None):
+        """build(scope) returns the JSON-encoded payload of a view; keys maps record lists to their id field"""
+        self._builders[kind] = (frozenset(tables), build, keys or {})
+
+    def watch(self, key: Tuple[str, Hashable]) -> dict:
+        """Start watching a view and return its current snapshot"""
+        with self._lock:
+            self._watchers[key] = self._watchers.get(key, 0) + 1
+            snapshot = self._snapshots.get(key)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="live-views", daemon=True)
+                self._worker.start()
+        if snapshot is None:
+            try:
+                snapshot = self._builders[key[0]][1](key[1])
+            except Exception:
+                self.unwatch(key)
+                raise
+            with self._lock:
+                snapshot = self._snapshots.setdefault(key, snapshot)
+        return snapshot
+
+    def unwatch(self, key: Tuple[str, Hashable]):
+        with self._lock:
+            remaining = self._watchers.get(key, 0) - 1
+            if remaining > 0:
+                self._watchers[key] = remaining
+            else:
+                self._watchers.pop(key, None)
+                self._snapshots.pop(key, None)
+                self._dirty.discard(key)
+
+    def _on_commit(self, event: dict):
+        changed = set(event["tables"])
+        with self._lock:
+            stale = [key for key in self._watchers if self._builders[key[0]][0] & changed]
+            self._dirty.update(stale)
+        if stale:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let bursts of commits settle into one rebuild
+            threading.Event().wait(self.debounce)
+            self._wake.clear()
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            for key in dirty:
+                try:
+                    self._refresh(key)
+                except Exception:
+                    logger.exception("Failed to refresh live view %s", key)
+
+    def _refresh(self, key):
+        new = self._builders[key[0]][1](key[1])
+        with self._lock:
+            if key not in self._watchers:
+                return
+            old = self._snapshots.get(key, {})
+            self._snapshots[key] = new
+        delta = diff(old, new, self._builders[key[0]][2])
+        if delta:
+            events.bus.publish("live", {"key": key, "delta": delta})
+
+views = LiveViews()
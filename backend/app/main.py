@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import assets, topology, customers, deployment, lifecycle, auth, audit, dashboards,ai_assistant
+from .routers import assets, topology, customers, deployment, lifecycle, auth, audit, dashboards,ai_assistant, sync, reports, batch
 from .database import engine, Base
+from . import jobs
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -21,6 +22,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Background jobs (splitter port reconciliation, ...)
+@app.on_event("startup")
+def start_background_jobs():
+    jobs.start_scheduler()
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    jobs.stop_scheduler()
+
 # Include routers
 app.include_router(assets.router)
 app.include_router(topology.router)
@@ -31,6 +41,9 @@ app.include_router(auth.router)
 app.include_router(audit.router)
 app.include_router(dashboards.router)
 app.include_router(ai_assistant.router)
+app.include_router(sync.router)
+app.include_router(reports.router)
+app.include_router(batch.router)
 
 @app.get("/")
 def read_root():
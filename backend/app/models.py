@@ -1,7 +1,64 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, DECIMAL, Date
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, Text, DateTime, ForeignKey, Enum, DECIMAL, Date, Index, UniqueConstraint, event, JSON, insert, update, delete
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from .database import Base
+from .database import Base, engine, version_engine
+
+class SyncVersion(Base):
+    """
+    Row versions for delta sync. Each write transaction takes the next
+    AUTO_INCREMENT id in its own short transaction and marks it finished once
+    it has committed or rolled back, so no lock is held across writers.
+    """
+    __tablename__ = "SyncVersion"
+    
+    version_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    allocated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished = Column(Boolean, nullable=False, default=False)
+    
+    __table_args__ = (
+        Index("idx_sync_version_finished", "finished", "version_id"),
+    )
+
+# Finished rows below the newest one are only pruned every this many versions
+SYNC_VERSION_PRUNE_EVERY = 100
+
+def finish_row_version(version: int):
+    with version_engine.begin() as conn:
+        conn.execute(update(SyncVersion).where(SyncVersion.version_id == version).values(finished=True))
+        if version % SYNC_VERSION_PRUNE_EVERY == 0:
+            conn.execute(delete(SyncVersion).where(SyncVersion.finished.is_(True), SyncVersion.version_id < version))
+
+def next_row_version(context):
+    """
+    Column default/onupdate for row_version: one version per transaction,
+    allocated outside it. Until the transaction ends the version stays
+    unfinished, which holds the sync token below it (see crud.get_sync_token).
+    """
+    conn = context.connection
+    transaction = conn.get_transaction()
+    cached = conn.info.get("row_version")
+    if cached and cached[0] is transaction:
+        return cached[1]
+    if cached and cached[2]:
+        # Earlier transaction on this connection has ended
+        finish_row_version(cached[1])
+    
+    if conn.dialect.name == "sqlite":
+        # Writers are serialized anyway; allocate inside the transaction, already finished
+        allocate = insert(SyncVersion).values(allocated_at=datetime.utcnow(), finished=True)
+        conn.info["row_version"] = (transaction, conn.execute(allocate).inserted_primary_key[0], False)
+    else:
+        with version_engine.begin() as version_conn:
+            allocate = insert(SyncVersion).values(allocated_at=datetime.utcnow())
+            conn.info["row_version"] = (transaction, version_conn.execute(allocate).inserted_primary_key[0], True)
+    return conn.info["row_version"][1]
+
+@event.listens_for(engine, "checkin")
+def _finish_row_version(dbapi_connection, connection_record):
+    # Connections go back to the pool after commit/rollback
+    cached = connection_record.info.pop("row_version", None)
+    if cached and cached[2]:
+        finish_row_version(cached[1])
 
 class Headend(Base):
     __tablename__ = "Headend"
@@ -23,6 +80,8 @@ class FDH(Base):
     region = Column(String(100))
     max_ports = Column(Integer, default=8)
     headend_id = Column(Integer, ForeignKey("Headend.headend_id"))
+    latitude = Column(DECIMAL(9, 6))
+    longitude = Column(DECIMAL(9, 6))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     headend = relationship("Headend", back_populates="fdhs")
@@ -37,6 +96,8 @@ class Splitter(Base):
     port_capacity = Column(Integer, default=8)
     used_ports = Column(Integer, default=0)
     location = Column(String(200))
+    latitude = Column(DECIMAL(9, 6))
+    longitude = Column(DECIMAL(9, 6))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     fdh = relationship("FDH", back_populates="splitters")
@@ -55,12 +116,37 @@ class Customer(Base):
     status = Column(Enum('Active', 'Inactive', 'Pending'), default='Pending')
     splitter_id = Column(Integer, ForeignKey("Splitter.splitter_id"))
     assigned_port = Column(Integer)
+    latitude = Column(DECIMAL(9, 6))
+    longitude = Column(DECIMAL(9, 6))
     created_at = Column(DateTime, default=datetime.utcnow)
+    deleted_at = Column(DateTime, nullable=True)  # Soft-delete marker; cascade runs in the background
+    row_version = Column(BigInteger, default=next_row_version, onupdate=next_row_version, index=True)
     
     splitter = relationship("Splitter", back_populates="customers")
     assigned_assets = relationship("AssignedAssets", back_populates="customer")
     fiber_drops = relationship("FiberDropLine", back_populates="customer")
     deployment_tasks = relationship("DeploymentTask", back_populates="customer")
+    search_tokens = relationship("CustomerSearchToken", back_populates="customer", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("idx_customer_status_created", "status", "created_at"),
+        Index("idx_customer_deleted", "deleted_at", "status"),
+    )
+
+class CustomerSearchToken(Base):
+    __tablename__ = "CustomerSearchToken"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, ForeignKey("Customer.customer_id"), nullable=False)
+    token = Column(String(100), nullable=False)
+    field = Column(Enum('name', 'address', 'neighborhood'), nullable=False)
+    
+    customer = relationship("Customer", back_populates="search_tokens")
+    
+    __table_args__ = (
+        Index("idx_search_token", "token", "customer_id", "field"),
+        Index("idx_search_customer", "customer_id"),
+    )
 
 class Asset(Base):
     __tablename__ = "Asset"
@@ -74,6 +160,7 @@ class Asset(Base):
     assigned_to_customer_id = Column(Integer, ForeignKey("Customer.customer_id"), nullable=True)
     assigned_date = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    row_version = Column(BigInteger, default=next_row_version, onupdate=next_row_version, index=True)
     
     assignments = relationship("AssignedAssets", back_populates="asset")
 
@@ -108,6 +195,7 @@ class Technician(Base):
     name = Column(String(100), nullable=False)
     contact = Column(String(50))
     region = Column(String(100))
+    daily_capacity = Column(Integer, default=4)  # Max tasks per scheduled day for auto-assignment
     user_id = Column(Integer, ForeignKey("User.user_id"), nullable=True, unique=True)  # NEW: Link to User
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -122,12 +210,105 @@ class DeploymentTask(Base):
     technician_id = Column(Integer, ForeignKey("Technician.technician_id"))
     status = Column(Enum('Scheduled', 'InProgress', 'Completed', 'Failed'), default='Scheduled')
     scheduled_date = Column(Date)
-    notes = Column(Text)
+    notes = Column(Text)  # Legacy free-text notes; new notes are appended to TaskNote
+    completed_at = Column(DateTime)  # When the task reached Completed/Failed
+    overdue_since = Column(DateTime)  # Set by the overdue sweeper, cleared once resolved
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    row_version = Column(BigInteger, default=next_row_version, onupdate=next_row_version, index=True)
     
     customer = relationship("Customer", back_populates="deployment_tasks")
     technician = relationship("Technician", back_populates="deployment_tasks")
+    task_notes = relationship("TaskNote", back_populates="task", cascade="all, delete-orphan", passive_deletes=True)
+    
+    __table_args__ = (
+        Index("idx_task_status_scheduled", "status", "scheduled_date"),
+        Index("idx_task_overdue", "overdue_since"),
+    )
+
+class TaskNote(Base):
+    __tablename__ = "TaskNote"
+    
+    note_id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, ForeignKey("DeploymentTask.task_id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(20))  # Task status recorded alongside the note, if any
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    task = relationship("DeploymentTask", back_populates="task_notes")
+    
+    __table_args__ = (
+        Index("idx_task_note_task_created", "task_id", "created_at"),
+    )
+
+class SyncTombstone(Base):
+    """
+    Deleted rows for delta sync. technician_id set means the row only left
+    that technician's view (e.g. a task reassigned to someone else).
+    """
+    __tablename__ = "SyncTombstone"
+    
+    tombstone_id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(Enum('DeploymentTask', 'Customer', 'Asset'), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    technician_id = Column(Integer)
+    row_version = Column(BigInteger, default=next_row_version, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+class DeploymentDailyRollup(Base):
+    """Per-day deployment outcomes by technician and region, maintained from status transitions"""
+    __tablename__ = "DeploymentDailyRollup"
+    
+    rollup_id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket_date = Column(Date, nullable=False)
+    technician_id = Column(Integer, nullable=False, default=0)  # 0 = unassigned
+    region = Column(String(100), nullable=False, default='')
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    # Scheduled -> Completed lead time of completed tasks
+    lead_time_hours_total = Column(DECIMAL(14, 2), nullable=False, default=0)
+    lead_le_1d = Column(Integer, nullable=False, default=0)
+    lead_le_3d = Column(Integer, nullable=False, default=0)
+    lead_le_7d = Column(Integer, nullable=False, default=0)
+    lead_le_14d = Column(Integer, nullable=False, default=0)
+    lead_gt_14d = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("bucket_date", "technician_id", "region", name="uq_rollup_bucket"),
+    )
+
+class CustomerStatusEvent(Base):
+    """Customer status transitions, with the devices reclaimed when deactivating"""
+    __tablename__ = "CustomerStatusEvent"
+    
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, ForeignKey("Customer.customer_id", ondelete="CASCADE"), nullable=False)
+    from_status = Column(String(20))
+    to_status = Column(String(20), nullable=False)
+    reclaimed_assets = Column(Integer, nullable=False, default=0)
+    reason = Column(String(200))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("idx_status_event_to_created", "to_status", "created_at"),
+        Index("idx_status_event_customer", "customer_id", "created_at"),
+    )
+
+class ReportSnapshot(Base):
+    """A stored run of a precomputed report (see reports.py)"""
+    __tablename__ = "ReportSnapshot"
+    
+    snapshot_id = Column(Integer, primary_key=True, autoincrement=True)
+    report = Column(String(50), nullable=False)
+    period_start = Column(Date)
+    period_end = Column(Date)
+    payload = Column(JSON, nullable=False)
+    generated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    duration_ms = Column(Integer)
+    
+    __table_args__ = (
+        Index("idx_report_snapshot_generated", "report", "generated_at"),
+    )
 
 class User(Base):
     __tablename__ = "User"
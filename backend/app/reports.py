@@ -0,0 +1,161 @@
+"""
+Precomputed report snapshots.
+
+Weekly manager reports are materialized into ReportSnapshot rows by the
+"generate-reports" job (daily at GENERATE_REPORTS_AT) and served as stored, with
+their generation time. Live endpoints remain the place for current data.
+"""
+import time
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import crud, models, rollups
+
+REPORT_PERIOD_DAYS = 7
+FDH_PAGE_SIZE = 1000
+
+def _asset_utilization(db: Session, period_start: date, period_end: date):
+    return {"by_type": crud.get_asset_utilization_stats(db)}
+
+def _fdh_fill_rates(db: Session, period_start: date, period_end: date):
+    """Every FDH's fill rate, read a page at a time, plus per-region totals"""
+    fdhs, summary, skip = [], None, 0
+    while True:
+        total, page, page_summary = crud.get_fdh_utilization(db, None, skip, FDH_PAGE_SIZE)
+        summary = summary or page_summary
+        fdhs.extend(page)
+        skip += FDH_PAGE_SIZE
+        if skip >= total:
+            break
+
+    regions = {}
+    for fdh in fdhs:
+        region = regions.setdefault(fdh["region"] or "", {"fdhs": 0, "total_capacity": 0, "used_ports": 0})
+        region["fdhs"] += 1
+        region["total_capacity"] += fdh["total_capacity"]
+        region["used_ports"] += fdh["used_ports"]
+    for region in regions.values():
+        capacity = region["total_capacity"]
+        region["utilization_percent"] = round(region["used_ports"] / capacity * 100, 2) if capacity else 0
+
+    return {"summary": summary, "by_region": regions, "fdhs": fdhs}
+
+def _deployment_throughput(db: Session, period_start: date, period_end: date):
+    return {
+        group_by or "total": rollups.query_rollups(db, period_start, period_end, group_by=group_by)
+        for group_by in (None, "day", "technician", "region")
+    }
+
+def _audit_activity(db: Session, period_start: date, period_end: date):
+    AuditLog = models.AuditLog
+    in_period = (
+        AuditLog.timestamp >= datetime.combine(period_start, datetime.min.time()),
+        AuditLog.timestamp < datetime.combine(period_end + timedelta(days=1), datetime.min.time())
+    )
+    by_type = db.query(
+        AuditLog.action_type, func.count(AuditLog.log_id)
+    ).filter(*in_period).group_by(AuditLog.action_type).all()
+
+    day = func.date(AuditLog.timestamp)
+    by_day = db.query(day, func.count(AuditLog.log_id)).filter(*in_period).group_by(day).order_by(day).all()
+
+    by_user = db.query(
+        AuditLog.user_id, models.User.username, models.User.role, func.count(AuditLog.log_id).label("actions")
+    ).outerjoin(
+        models.User, AuditLog.user_id == models.User.user_id
+    ).filter(*in_period).group_by(
+        AuditLog.user_id, models.User.username, models.User.role
+    ).order_by(func.count(AuditLog.log_id).desc()).all()
+
+    return {
+        "total_logs": sum(count for _, count in by_type),
+        "actions_by_type": {action: count for action, count in by_type},
+        "actions_by_day": {str(bucket): count for bucket, count in by_day},
+        "actions_by_user": [
+            {"user_id": row.user_id, "username": row.username or "Unknown", "role": row.role, "actions": row.actions}
+            for row in by_user
+        ]
+    }
+
+# name -> builder(db, period_start, period_end)
+REPORTS = {
+    "asset-utilization": _asset_utilization,
+    "fdh-fill-rates": _fdh_fill_rates,
+    "deployment-throughput": _deployment_throughput,
+    "audit-activity": _audit_activity,
+}
+
+def last_period_end() -> date:
+    return date.today() - timedelta(days=1)
+
+def generate_snapshots(
+    db: Session,
+    reports: Optional[Iterable[str]] = None,
+    period_end: Optional[date] = None,
+    keep: int = 30
+):
+    """
+    Build and store a snapshot of each report for the REPORT_PERIOD_DAYS
+    ending on period_end (yesterday by default), one transaction per
+    report. Only the newest `keep` snapshots of each report are retained.
+    """
+    period_end = period_end or last_period_end()
+    period_start = period_end - timedelta(days=REPORT_PERIOD_DAYS - 1)
+    generated = []
+
+    for name in reports or REPORTS:
+        started = time.perf_counter()
+        payload = jsonable_encoder(REPORTS[name](db, period_start, period_end))
+        snapshot = models.ReportSnapshot(
+            report=name,
+            period_start=period_start,
+            period_end=period_end,
+            payload=payload,
+            generated_at=datetime.utcnow(),
+            duration_ms=int((time.perf_counter() - started) * 1000)
+        )
+        db.add(snapshot)
+        db.flush()
+
+        stale = db.query(models.ReportSnapshot.snapshot_id).filter(
+            models.ReportSnapshot.report == name
+        ).order_by(models.ReportSnapshot.generated_at.desc()).offset(keep).all()
+        if stale:
+            db.query(models.ReportSnapshot).filter(
+                models.ReportSnapshot.snapshot_id.in_([row.snapshot_id for row in stale])
+            ).delete(synchronize_session=False)
+        db.commit()
+
+        generated.append({"report": name, "snapshot_id": snapshot.snapshot_id, "duration_ms": snapshot.duration_ms})
+
+    return {"period_start": period_start, "period_end": period_end, "generated": generated}
+
+def missing_reports(db: Session, period_end: Optional[date] = None):
+    """Reports without a snapshot for the period ending on period_end (yesterday by default)"""
+    period_end = period_end or last_period_end()
+    done = {
+        report for (report,) in db.query(models.ReportSnapshot.report).filter(
+            models.ReportSnapshot.period_end == period_end
+        ).distinct().all()
+    }
+    return [name for name in REPORTS if name not in done]
+
+def get_snapshot(db: Session, report: str, snapshot_id: Optional[int] = None):
+    """Latest snapshot of a report (or a specific one), from the (report, generated_at) index"""
+    query = db.query(models.ReportSnapshot).filter(models.ReportSnapshot.report == report)
+    if snapshot_id is not None:
+        return query.filter(models.ReportSnapshot.snapshot_id == snapshot_id).first()
+    return query.order_by(models.ReportSnapshot.generated_at.desc()).first()
+
+def list_snapshots(db: Session, report: Optional[str] = None, limit: int = 30):
+    """Snapshot metadata, newest first, without payloads"""
+    Snapshot = models.ReportSnapshot
+    query = db.query(
+        Snapshot.snapshot_id, Snapshot.report, Snapshot.period_start, Snapshot.period_end,
+        Snapshot.generated_at, Snapshot.duration_ms
+    )
+    if report:
+        query = query.filter(Snapshot.report == report)
+    return [dict(row._mapping) for row in query.order_by(Snapshot.generated_at.desc()).limit(limit).all()]
@@ -0,0 +1,203 @@
+"""
+Daily deployment rollups.
+
+Every task status transition adds to (or, when a finished task is reopened,
+subtracts from) one DeploymentDailyRollup row keyed by completion day,
+technician and region. Throughput, failure rate and lead-time stats then
+read only these buckets instead of scanning DeploymentTask.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+
+TERMINAL_STATUSES = ('Completed', 'Failed')
+
+# (upper bound in hours, column); None = no upper bound
+LEAD_TIME_BUCKETS = [
+    (24, "lead_le_1d"),
+    (72, "lead_le_3d"),
+    (168, "lead_le_7d"),
+    (336, "lead_le_14d"),
+    (None, "lead_gt_14d"),
+]
+
+COUNTER_COLUMNS = ["completed", "failed", "lead_time_hours_total"] + [col for _, col in LEAD_TIME_BUCKETS]
+
+def _lead_time_hours(created_at: Optional[datetime], finished_at: datetime) -> float:
+    if not created_at:
+        return 0.0
+    return max((finished_at - created_at).total_seconds() / 3600, 0.0)
+
+def _lead_bucket(hours: float) -> str:
+    for upper, column in LEAD_TIME_BUCKETS:
+        if upper is None or hours <= upper:
+            return column
+
+def _deltas(status: str, lead_hours: float, sign: int = 1) -> dict:
+    if status == 'Failed':
+        return {"failed": sign}
+    return {"completed": sign, "lead_time_hours_total": round(lead_hours, 2) * sign, _lead_bucket(lead_hours): sign}
+
+def _task_region(db: Session, task) -> str:
+    region = db.query(models.FDH.region).join(
+        models.Splitter, models.Splitter.fdh_id == models.FDH.fdh_id
+    ).join(
+        models.Customer, models.Customer.splitter_id == models.Splitter.splitter_id
+    ).filter(models.Customer.customer_id == task.customer_id).scalar()
+    return region or ''
+
+def _apply(db: Session, bucket_date: date, technician_id: int, region: str, deltas: dict):
+    """Add deltas to a bucket, creating it on first use"""
+    Rollup = models.DeploymentDailyRollup
+    bucket = db.query(Rollup).filter(
+        Rollup.bucket_date == bucket_date,
+        Rollup.technician_id == technician_id,
+        Rollup.region == region
+    )
+    values = {getattr(Rollup, col): getattr(Rollup, col) + delta for col, delta in deltas.items()}
+
+    if bucket.update(values, synchronize_session=False):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        # Nothing to take back from; a rebuild will restore consistency
+        return
+    try:
+        with db.begin_nested():
+            db.add(Rollup(bucket_date=bucket_date, technician_id=technician_id, region=region, **deltas))
+    except IntegrityError:
+        # Another transaction created the bucket first
+        bucket.update(values, synchronize_session=False)
+
+def record_transition(db: Session, task: models.DeploymentTask, old_status: str, new_status: str, at: datetime):
+    """
+    Update rollups for a task moving from old_status to new_status at `at`.
+    Must run before task.completed_at is changed; the caller commits.
+    """
+    if old_status == new_status:
+        return
+    leaving = old_status in TERMINAL_STATUSES and task.completed_at is not None
+    entering = new_status in TERMINAL_STATUSES
+    if not (leaving or entering):
+        return
+
+    technician_id = task.technician_id or 0
+    region = _task_region(db, task)
+
+    if leaving:
+        lead = _lead_time_hours(task.created_at, task.completed_at)
+        _apply(db, task.completed_at.date(), technician_id, region, _deltas(old_status, lead, -1))
+    if entering:
+        lead = _lead_time_hours(task.created_at, at)
+        _apply(db, at.date(), technician_id, region, _deltas(new_status, lead))
+
+def rebuild_rollups(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None, batch_size: int = 1000):
+    """Recompute buckets in a date range (all dates by default) from finished tasks"""
+    Task = models.DeploymentTask
+    Rollup = models.DeploymentDailyRollup
+
+    day = func.date(Task.completed_at)
+    tasks = db.query(
+        Task.status, Task.technician_id, Task.created_at, Task.completed_at, models.FDH.region
+    ).join(
+        models.Customer, Task.customer_id == models.Customer.customer_id
+    ).outerjoin(
+        models.Splitter, models.Customer.splitter_id == models.Splitter.splitter_id
+    ).outerjoin(
+        models.FDH, models.Splitter.fdh_id == models.FDH.fdh_id
+    ).filter(Task.status.in_(TERMINAL_STATUSES), Task.completed_at.isnot(None))
+
+    buckets = db.query(Rollup)
+    if date_from:
+        tasks = tasks.filter(day >= date_from)
+        buckets = buckets.filter(Rollup.bucket_date >= date_from)
+    if date_to:
+        tasks = tasks.filter(day <= date_to)
+        buckets = buckets.filter(Rollup.bucket_date <= date_to)
+
+    totals = defaultdict(lambda: defaultdict(float))
+    for row in tasks.yield_per(batch_size):
+        key = (row.completed_at.date(), row.technician_id or 0, row.region or '')
+        lead = _lead_time_hours(row.created_at, row.completed_at)
+        for column, delta in _deltas(row.status, lead).items():
+            totals[key][column] += delta
+
+    removed = buckets.delete(synchronize_session=False)
+    rows = [
+        {"bucket_date": key[0], "technician_id": key[1], "region": key[2],
+         **{col: (round(v, 2) if col == "lead_time_hours_total" else int(v)) for col, v in counters.items()}}
+        for key, counters in totals.items()
+    ]
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(Rollup), rows[start:start + batch_size])
+    db.commit()
+
+    return {"buckets_removed": removed, "buckets_written": len(rows)}
+
+def _percentile_bucket(histogram: dict, fraction: float) -> Optional[str]:
+    total = sum(histogram.values())
+    if not total:
+        return None
+    running = 0
+    for label, count in histogram.items():
+        running += count
+        if running >= total * fraction:
+            return label
+
+GROUPINGS = {
+    "day": models.DeploymentDailyRollup.bucket_date,
+    "technician": models.DeploymentDailyRollup.technician_id,
+    "region": models.DeploymentDailyRollup.region,
+}
+
+HISTOGRAM_LABELS = {
+    "lead_le_1d": "<=1d",
+    "lead_le_3d": "1-3d",
+    "lead_le_7d": "3-7d",
+    "lead_le_14d": "7-14d",
+    "lead_gt_14d": ">14d",
+}
+
+def query_rollups(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    technician_id: Optional[int] = None,
+    region: Optional[str] = None,
+    group_by: Optional[str] = "day"
+):
+    """Aggregate buckets in [date_from, date_to], optionally grouped by day, technician or region"""
+    Rollup = models.DeploymentDailyRollup
+    sums = [func.coalesce(func.sum(getattr(Rollup, col)), 0).label(col) for col in COUNTER_COLUMNS]
+    group_column = GROUPINGS.get(group_by)
+
+    columns = ([group_column.label("group")] if group_column is not None else []) + sums
+    query = db.query(*columns).filter(Rollup.bucket_date >= date_from, Rollup.bucket_date <= date_to)
+    if technician_id is not None:
+        query = query.filter(Rollup.technician_id == technician_id)
+    if region is not None:
+        query = query.filter(Rollup.region == region)
+    if group_column is not None:
+        query = query.group_by(group_column).order_by(group_column)
+
+    results = []
+    for row in query.all():
+        completed, failed = int(row.completed), int(row.failed)
+        finished = completed + failed
+        histogram = {label: int(getattr(row, col)) for col, label in HISTOGRAM_LABELS.items()}
+        item = {
+            "completed": completed,
+            "failed": failed,
+            "failure_rate": round(failed / finished, 4) if finished else None,
+            "avg_lead_time_hours": round(float(row.lead_time_hours_total) / completed, 2) if completed else None,
+            "lead_time_histogram": histogram,
+            "lead_time_p50": _percentile_bucket(histogram, 0.5),
+            "lead_time_p90": _percentile_bucket(histogram, 0.9),
+        }
+        if group_column is not None:
+            item = {group_by: row.group, **item}
+        results.append(item)
+    return results
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional
 from pydantic import BaseModel
-from .. import models
+from .. import crud, models
 from ..database import get_db
 from datetime import datetime
 import os
@@ -33,11 +33,11 @@ def get_system_context(db: Session, role: str):
     """Get current system state as context for AI"""
     
     # Get statistics
-    total_customers = db.query(models.Customer).count()
-    active_customers = db.query(models.Customer).filter(
+    total_customers = crud.live_customers(db).count()
+    active_customers = crud.live_customers(db).filter(
         models.Customer.status == 'Active'
     ).count()
-    pending_customers = db.query(models.Customer).filter(
+    pending_customers = crud.live_customers(db).filter(
         models.Customer.status == 'Pending'
     ).count()
     
@@ -80,7 +80,7 @@ def get_system_context(db: Session, role: str):
     
     task_info = []
     for task in recent_tasks:
-        customer = db.query(models.Customer).filter(
+        customer = crud.live_customers(db).filter(
             models.Customer.customer_id == task.customer_id
         ).first()
         task_info.append({
@@ -306,7 +306,7 @@ async def get_quick_actions(role: str, db: Session = Depends(get_db)):
     
     if role in ["Planner", "Admin"]:
         # Check for pending customers
-        pending_count = db.query(models.Customer).filter(
+        pending_count = crud.live_customers(db).filter(
             models.Customer.status == 'Pending'
         ).count()
         
@@ -319,11 +319,8 @@ async def get_quick_actions(role: str, db: Session = Depends(get_db)):
             })
     
     if role in ["Technician", "Planner", "Admin"]:
-        # Check for overdue tasks
-        overdue_tasks = db.query(models.DeploymentTask).filter(
-            models.DeploymentTask.status == 'Scheduled',
-            models.DeploymentTask.scheduled_date < datetime.now().date()
-        ).count()
+        # Overdue flags are maintained by the sweep-overdue-tasks job
+        overdue_tasks = crud.count_overdue_tasks(db)
         
         if overdue_tasks > 0:
             actions.append({
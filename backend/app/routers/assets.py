@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from .. import crud, schemas
+from .. import crud, schemas, models
+from ..coalesce import coalesce_requests
 from ..database import get_db
 
 router = APIRouter(prefix="/assets", tags=["assets"])
@@ -22,10 +25,19 @@ def get_assets(
     asset_type: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     location: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description='Comma-separated fields to return, e.g. "serial_number,model"; asset_id is always included'),
     db: Session = Depends(get_db)
 ):
-    """Get all assets with optional filters"""
-    return crud.get_assets(db, skip, limit, asset_type, status, location)
+    """Get all assets with optional filters; `fields` selects only those columns"""
+    try:
+        columns = crud.sparse_columns(models.Asset, schemas.Asset, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    assets = crud.get_assets(db, skip, limit, asset_type, status, location, columns)
+    if columns:
+        return JSONResponse(jsonable_encoder([row._asdict() for row in assets]))
+    return assets
 
 @router.get("/{asset_id}", response_model=schemas.Asset)
 def get_asset(asset_id: int, db: Session = Depends(get_db)):
@@ -70,6 +82,7 @@ def get_asset_history(asset_id: int, db: Session = Depends(get_db)):
 
 # Additional inventory endpoints
 @router.get("/stats/summary")
+@coalesce_requests("assets.summary")
 def get_asset_summary(db: Session = Depends(get_db)):
     """Get asset statistics summary"""
     from sqlalchemy import func
@@ -4,6 +4,7 @@ from typing import List
 from datetime import datetime
 import bcrypt
 from .. import crud, schemas, models
+from ..cache import technician_identities
 from ..database import get_db
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -52,11 +53,9 @@ def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     # Get technician_id if user is a technician
     technician_id = None
     if user.role == 'Technician':
-        technician = db.query(models.Technician).filter(
-            models.Technician.user_id == user.user_id
-        ).first()
-        if technician:
-            technician_id = technician.technician_id
+        identity = technician_identities.get(db, user.user_id)
+        if identity:
+            technician_id = identity[0]
     
     return {
         "user_id": user.user_id,
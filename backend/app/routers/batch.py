@@ -0,0 +1,88 @@
+"""
+Batched GETs for page bootstrap: one HTTP round trip instead of one per
+lookup. Sub-requests are dispatched in-process through the app, up to
+BATCH_CONCURRENCY at a time, each with its own pooled database session.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import urlsplit
+from fastapi import APIRouter, HTTPException, Request
+from .. import schemas
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 20
+BATCH_CONCURRENCY = 4
+SUB_REQUEST_TIMEOUT_SECONDS = 30
+# Not forwarded to sub-requests
+SKIPPED_HEADERS = {b"content-length", b"content-type", b"accept-encoding", b"host"}
+
+async def _dispatch(app, request: Request, path: str):
+    """Run one GET through the ASGI app and collect (status, headers, body)"""
+    url = urlsplit(path)
+    scope = {
+        **request.scope,
+        "method": "GET",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": [(k, v) for k, v in request.scope["headers"] if k not in SKIPPED_HEADERS],
+    }
+    for key in ("route", "endpoint", "path_params", "router"):
+        scope.pop(key, None)
+    
+    response = {"status": 500, "headers": {}, "body": b""}
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode(): v.decode() for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+    
+    await app(scope, receive, send)
+    return response
+
+async def _run(app, request: Request, sub: schemas.BatchSubRequest, slots: asyncio.Semaphore):
+    try:
+        # The timeout covers running the sub-request, not waiting for a slot
+        async with slots:
+            response = await asyncio.wait_for(_dispatch(app, request, sub.path), SUB_REQUEST_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"id": sub.id, "path": sub.path, "status": 504, "body": {"detail": "Sub-request timed out"}}
+    except Exception:
+        # ServerErrorMiddleware re-raises after its own 500; keep it to this entry
+        logger.exception("Batch sub-request %s failed", sub.path)
+        return {"id": sub.id, "path": sub.path, "status": 500, "body": {"detail": "Internal Server Error"}}
+    
+    body = response["body"]
+    if response["headers"].get("content-type", "").startswith("application/json"):
+        body = json.loads(body) if body else None
+    else:
+        body = body.decode(errors="replace")
+    return {"id": sub.id, "path": sub.path, "status": response["status"], "body": body}
+
+@router.post("/")
+async def run_batch(batch: schemas.BatchRequest, request: Request):
+    """
+    Run up to 20 internal GET sub-requests and return all their responses,
+    in order, each with its own status and body. Sub-requests run
+    concurrently (BATCH_CONCURRENCY at a time) on their own sessions.
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="No sub-requests given")
+    if len(batch.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} sub-requests per batch")
+    for sub in batch.requests:
+        path = urlsplit(sub.path).path
+        if not sub.path.startswith("/") or path.rstrip("/") == "/batch" or "/stream/" in path:
+            raise HTTPException(status_code=400, detail=f"Cannot batch {sub.path}")
+    
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    responses = await asyncio.gather(*(_run(request.app, request, sub, slots) for sub in batch.requests))
+    return {"responses": responses}
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from .. import crud, schemas, models
+from datetime import datetime
+from .. import crud, schemas, models, jobs
 from ..database import get_db
 
 router = APIRouter(prefix="/customers", tags=["customers"])
@@ -65,10 +68,37 @@ def get_customers(
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description='Comma-separated fields to return, e.g. "name,status"; customer_id is always included'),
     db: Session = Depends(get_db)
 ):
-    """Get all customers with optional status filter"""
-    return crud.get_customers(db, skip, limit, status)
+    """Get all customers with optional status filter; `fields` selects only those columns"""
+    try:
+        columns = crud.sparse_columns(models.Customer, schemas.Customer, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    customers = crud.get_customers(db, skip, limit, status, columns)
+    if columns:
+        return JSONResponse(jsonable_encoder([row._asdict() for row in customers]))
+    return customers
+
+@router.get("/search", response_model=List[schemas.CustomerSummary])
+def search_customers(
+    q: str = Query(..., min_length=1, description="Search text (prefix match on name, address, neighborhood)"),
+    limit: int = Query(20, le=100),
+    status: Optional[str] = Query(None),
+    region: Optional[str] = Query(None),
+    field: Optional[str] = Query(None, pattern="^(name|address|neighborhood)$", description="Match only this field"),
+    db: Session = Depends(get_db)
+):
+    """Typeahead customer search (terms shorter than 2 characters are ignored)"""
+    return crud.search_customers(db, q, limit, status, region, field)
+
+@router.post("/search/rebuild")
+def rebuild_customer_search_index(db: Session = Depends(get_db)):
+    """Rebuild the customer search index from scratch (Admin only in production)"""
+    indexed = crud.rebuild_customer_search_index(db)
+    return {"message": "Customer search index rebuilt", "customers_indexed": indexed}
 
 @router.get("/{customer_id}", response_model=schemas.Customer)
 def get_customer(customer_id: int, db: Session = Depends(get_db)):
@@ -81,23 +111,14 @@ def get_customer(customer_id: int, db: Session = Depends(get_db)):
 @router.get("/{customer_id}/details")
 def get_customer_details(customer_id: int, db: Session = Depends(get_db)):
     """Get customer with assigned assets and splitter info"""
-    customer = crud.get_customer(db, customer_id)
+    customer = crud.get_customer_with_details(db, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    # Get assigned assets
-    assigned_assets = crud.get_customer(db, customer_id).assigned_assets
-    assets = [assignment.asset for assignment in assigned_assets]
-    
-    # Get splitter info
-    splitter = None
-    if customer.splitter_id:
-        splitter = crud.get_splitter(db, customer.splitter_id)
-    
     return {
-        "customer": customer,
-        "assets": assets,
-        "splitter": splitter
+        "customer": schemas.Customer.model_validate(customer),
+        "assets": [schemas.Asset.model_validate(a.asset) for a in customer.assigned_assets],
+        "splitter": schemas.Splitter.model_validate(customer.splitter) if customer.splitter else None
     }
 
 @router.put("/{customer_id}", response_model=schemas.Customer)
@@ -154,94 +175,81 @@ def assign_assets_to_customer(
 # ========================================
 
 @router.delete("/{customer_id}")
-def delete_customer(customer_id: int, db: Session = Depends(get_db)):
+def delete_customer(
+    customer_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """
-    Delete a customer permanently and reclaim all assigned assets
+    Delete a customer and reclaim all assigned assets
     
-    This will:
-    - Delete fiber drop lines (MUST BE FIRST to avoid IntegrityError)
-    - Delete the customer record
-    - Reclaim all assigned assets (set to Available)
-    - Delete all deployment tasks for this customer
-    - Delete all asset assignment records
+    The customer is soft-deleted immediately (hidden from all lists, splitter
+    port released). A background job then:
+    - Deletes fiber drop lines
+    - Reclaims all assigned assets (set to Available)
+    - Deletes deployment tasks and asset assignment records
+    - Deletes the customer record
     """
-    
-    # Get customer
-    customer = db.query(models.Customer).filter(
-        models.Customer.customer_id == customer_id
-    ).first()
-    
-    if not customer:
-        raise HTTPException(status_code=404, detail="Customer not found")
-    
     try:
-        # Step 0: Delete fiber drop lines FIRST (prevents IntegrityError)
-        fiber_lines_deleted = 0
-        if hasattr(models, 'FiberDropLine'):
-            try:
-                fiber_lines = db.query(models.FiberDropLine).filter(
-                    models.FiberDropLine.to_customer_id == customer_id
-                ).all()
-                fiber_lines_deleted = len(fiber_lines)
-                for line in fiber_lines:
-                    db.delete(line)
-            except Exception as fiber_error:
-                # If FiberDropLine model doesn't exist, continue
-                print(f"Note: Could not delete fiber lines: {fiber_error}")
-        
-        # Step 1: Reclaim all assigned assets
-        assigned_assets = db.query(models.AssignedAssets).filter(
-            models.AssignedAssets.customer_id == customer_id
-        ).all()
-        
-        reclaimed_count = 0
-        for assignment in assigned_assets:
-            asset = db.query(models.Asset).filter(
-                models.Asset.asset_id == assignment.asset_id
-            ).first()
-            if asset:
-                asset.status = 'Available'
-                asset.assigned_to_customer_id = None
-                asset.assigned_date = None
-                reclaimed_count += 1
-        
-        # Step 2: Delete assigned assets records
-        db.query(models.AssignedAssets).filter(
-            models.AssignedAssets.customer_id == customer_id
-        ).delete()
-        
-        # Step 3: Delete deployment tasks
-        tasks_deleted = db.query(models.DeploymentTask).filter(
-            models.DeploymentTask.customer_id == customer_id
-        ).delete()
-        
-        # Step 4: Free up splitter port
-        if customer.splitter_id and customer.assigned_port:
-            splitter = db.query(models.Splitter).filter(
-                models.Splitter.splitter_id == customer.splitter_id
-            ).first()
-            if splitter and splitter.used_ports > 0:
-                splitter.used_ports -= 1
-        
-        # Step 5: Delete customer (LAST)
-        db.delete(customer)
-        db.commit()
-        
-        return {
-            "message": "Customer deleted successfully",
-            "customer_id": customer_id,
-            "customer_name": customer.name,
-            "reclaimed_assets": reclaimed_count,
-            "deleted_tasks": tasks_deleted,
-            "deleted_fiber_lines": fiber_lines_deleted
-        }
-        
+        customer = crud.delete_customer(db, customer_id)
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error deleting customer: {str(e)}"
         )
+    
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    # Only this customer; the scheduled job sweeps up anything left behind
+    background_tasks.add_task(jobs.purge_deleted_customers, customer_ids=[customer_id])
+    
+    return {
+        "message": "Customer deleted successfully",
+        "customer_id": customer_id,
+        "customer_name": customer.name,
+        "cleanup": "scheduled"
+    }
+
+def _bulk_targets(db: Session, request: schemas.BulkCustomerStatusRequest, statuses: List[str]):
+    if request.customer_ids is None and not request.neighborhood and not request.splitter_id:
+        raise HTTPException(status_code=400, detail="Provide customer_ids or at least one filter")
+    return crud.find_customers(
+        db,
+        customer_ids=request.customer_ids,
+        statuses=statuses,
+        neighborhood=request.neighborhood,
+        splitter_id=request.splitter_id
+    )
+
+@router.post("/bulk/deactivate")
+def bulk_deactivate_customers(request: schemas.BulkCustomerStatusRequest, db: Session = Depends(get_db)):
+    """
+    Deactivate many customers at once (by IDs and/or filter)
+    
+    Devices are released and splitter usage is recounted with a few set-based
+    statements instead of per-customer work.
+    """
+    targets = _bulk_targets(db, request, ['Active', 'Pending'])
+    try:
+        result = crud.deactivate_customers(db, targets, reason=request.reason)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deactivating customers: {str(e)}")
+    
+    result.pop("reclaimed_asset_details")
+    return {"message": "Customers deactivated successfully", "reason": request.reason, **result}
+
+@router.post("/bulk/activate")
+def bulk_activate_customers(request: schemas.BulkCustomerStatusRequest, db: Session = Depends(get_db)):
+    """Reactivate many Inactive customers at once (status becomes Pending)"""
+    targets = _bulk_targets(db, request, ['Inactive'])
+    try:
+        result = crud.activate_customers(db, targets, reason=request.reason)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error activating customers: {str(e)}")
+    
+    return {"message": "Customers reactivated (status: Pending)", **result}
 
 @router.post("/{customer_id}/deactivate")
 def deactivate_customer(
@@ -258,9 +266,7 @@ def deactivate_customer(
     - Keep customer record for history
     """
     
-    customer = db.query(models.Customer).filter(
-        models.Customer.customer_id == customer_id
-    ).first()
+    customer = crud.get_customer(db, customer_id)
     
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -268,57 +274,25 @@ def deactivate_customer(
     if customer.status == 'Inactive':
         raise HTTPException(status_code=400, detail="Customer is already inactive")
     
+    customer_name = customer.name
     try:
-        # Update customer status
-        customer.status = 'Inactive'
-        
-        # Reclaim assets
-        assigned_assets = db.query(models.AssignedAssets).filter(
-            models.AssignedAssets.customer_id == customer_id
-        ).all()
-        
-        reclaimed_count = 0
-        reclaimed_asset_list = []
-        
-        for assignment in assigned_assets:
-            asset = db.query(models.Asset).filter(
-                models.Asset.asset_id == assignment.asset_id
-            ).first()
-            if asset:
-                asset.status = 'Available'
-                asset.assigned_to_customer_id = None
-                reclaimed_count += 1
-                reclaimed_asset_list.append({
-                    "asset_id": asset.asset_id,
-                    "type": asset.asset_type,
-                    "serial": asset.serial_number
-                })
-        
-        # Free up splitter port
-        if customer.splitter_id and customer.assigned_port:
-            splitter = db.query(models.Splitter).filter(
-                models.Splitter.splitter_id == customer.splitter_id
-            ).first()
-            if splitter and splitter.used_ports > 0:
-                splitter.used_ports -= 1
-        
-        db.commit()
-        
-        return {
-            "message": "Customer deactivated successfully",
-            "customer_id": customer_id,
-            "customer_name": customer.name,
-            "reason": reason,
-            "reclaimed_assets": reclaimed_count,
-            "reclaimed_asset_details": reclaimed_asset_list
-        }
-        
+        result = crud.deactivate_customers(
+            db, [(customer.customer_id, customer.splitter_id)], include_asset_details=True, reason=reason
+        )
     except Exception as e:
-        db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error deactivating customer: {str(e)}"
         )
+    
+    return {
+        "message": "Customer deactivated successfully",
+        "customer_id": customer_id,
+        "customer_name": customer_name,
+        "reason": reason,
+        "reclaimed_assets": result["reclaimed_assets"],
+        "reclaimed_asset_details": result["reclaimed_asset_details"]
+    }
 
 @router.post("/{customer_id}/activate")
 def activate_customer(customer_id: int, db: Session = Depends(get_db)):
@@ -330,9 +304,7 @@ def activate_customer(customer_id: int, db: Session = Depends(get_db)):
     - Customer will need a new deployment task to become Active
     """
     
-    customer = db.query(models.Customer).filter(
-        models.Customer.customer_id == customer_id
-    ).first()
+    customer = crud.get_customer(db, customer_id)
     
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
@@ -343,62 +315,58 @@ def activate_customer(customer_id: int, db: Session = Depends(get_db)):
     if customer.status == 'Pending':
         raise HTTPException(status_code=400, detail="Customer is already pending")
     
+    customer_name = customer.name
     try:
         # Set to Pending - will need new deployment task
-        customer.status = 'Pending'
-        db.commit()
-        
-        return {
-            "message": "Customer reactivated (status: Pending)",
-            "customer_id": customer_id,
-            "customer_name": customer.name,
-            "note": "Create a deployment task to activate service"
-        }
-        
+        crud.activate_customers(db, [(customer.customer_id, customer.splitter_id)])
     except Exception as e:
-        db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error activating customer: {str(e)}"
         )
+    
+    return {
+        "message": "Customer reactivated (status: Pending)",
+        "customer_id": customer_id,
+        "customer_name": customer_name,
+        "note": "Create a deployment task to activate service"
+    }
 
 @router.get("/status/pending")
-def get_pending_customers(db: Session = Depends(get_db)):
+def get_pending_customers(
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    sort: str = Query("longest_wait", pattern="^(longest_wait|shortest_wait)$"),
+    db: Session = Depends(get_db)
+):
     """
-    Get all pending customers with their details
+    Get pending customers with their details, sorted by wait time
     
     Returns customers with status='Pending' along with:
     - Assigned assets
-    - Deployment task status (if exists)
+    - Latest deployment task status (if exists)
     """
+    total, customers, latest_tasks = crud.get_pending_customers(
+        db, skip, limit, longest_wait_first=(sort == "longest_wait")
+    )
     
-    customers = db.query(models.Customer).filter(
-        models.Customer.status == 'Pending'
-    ).all()
-    
+    now = datetime.utcnow()
     result = []
     for customer in customers:
-        # Get assigned assets
-        assigned_assets = db.query(models.AssignedAssets).filter(
-            models.AssignedAssets.customer_id == customer.customer_id
-        ).all()
-        assets = [assignment.asset for assignment in assigned_assets]
-        
-        # Get deployment task if exists
-        task = db.query(models.DeploymentTask).filter(
-            models.DeploymentTask.customer_id == customer.customer_id
-        ).order_by(models.DeploymentTask.created_at.desc()).first()
-        
+        task = latest_tasks.get(customer.customer_id)
         result.append({
-            "customer": customer,
-            "assets": assets,
-            "deployment_task": task,
+            "customer": schemas.Customer.model_validate(customer),
+            "assets": [schemas.Asset.model_validate(a.asset) for a in customer.assigned_assets],
+            "deployment_task": schemas.DeploymentTask.model_validate(task) if task else None,
             "has_task": task is not None,
             "task_status": task.status if task else None,
-            "waiting_for": "deployment_task" if not task else f"task_{task.status.lower()}"
+            "waiting_for": "deployment_task" if not task else f"task_{task.status.lower()}",
+            "waiting_days": (now - customer.created_at).days if customer.created_at else None
         })
     
     return {
-        "total_pending": len(result),
+        "total_pending": total,
+        "skip": skip,
+        "limit": limit,
         "pending_customers": result
-    }
\ No newline at end of file
+    }
@@ -1,266 +1,293 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, timedelta
-from .. import crud, models
-from ..database import get_db
+import asyncio
+import json
+from .. import crud, models, events
+from ..cache import dashboard_cache, technician_identities
+from ..database import get_db, SessionLocal
+from ..live import views
 
 router = APIRouter(prefix="/dashboards", tags=["dashboards"])
 
+# Tables each shared dashboard payload is built from; a commit touching any
+# of them drops the cached payload
+PLANNER_TABLES = {"Asset", "Customer", "FDH", "Splitter"}
+TECHNICIAN_TABLES = {"DeploymentTask", "Technician"}
+ADMIN_TABLES = {"Asset", "Customer", "DeploymentTask", "AuditLog", "User", "Technician", "FDH", "Splitter"}
+SUPPORT_TABLES = {"Customer", "CustomerStatusEvent"}
+
+def _viewer(db: Session, user_id: int):
+    """Per-user fragment layered over the shared payload"""
+    user = db.query(models.User.user_id, models.User.username, models.User.role).filter(
+        models.User.user_id == user_id
+    ).first()
+    return dict(user._mapping) if user else {"user_id": user_id, "username": None, "role": None}
+
 @router.get("/planner/{user_id}")
-def get_planner_dashboard(user_id: int, db: Session = Depends(get_db)):
+def get_planner_dashboard(
+    user_id: int,
+    region: Optional[str] = Query(None, description="Limit FDH utilization to a region"),
+    fdh_skip: int = Query(0, ge=0),
+    fdh_limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
     """Get dashboard data for Planner role"""
+    payload = dashboard_cache.get_or_compute(
+        ("planner", region, fdh_skip, fdh_limit), PLANNER_TABLES,
+        lambda: _planner_payload(db, region, fdh_skip, fdh_limit)
+    )
+    return {**payload, "viewer": _viewer(db, user_id)}
+
+def _planner_payload(db: Session, region: Optional[str], fdh_skip: int, fdh_limit: int):
     # Basic stats
-    total_assets = db.query(models.Asset).count()
-    available_assets = db.query(models.Asset).filter(models.Asset.status == 'Available').count()
-    assigned_assets = db.query(models.Asset).filter(models.Asset.status == 'Assigned').count()
-    
-    total_customers = db.query(models.Customer).count()
-    active_customers = db.query(models.Customer).filter(models.Customer.status == 'Active').count()
-    pending_customers = db.query(models.Customer).filter(models.Customer.status == 'Pending').count()
+    asset_counts = crud.get_asset_counts(db)
+    customer_counts = crud.get_customer_counts(db)
     
     # Recent onboardings (last 7 days)
     week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_onboardings = db.query(models.Customer).filter(
+    recent_onboardings = crud.live_customers(db).filter(
         models.Customer.created_at >= week_ago
     ).order_by(models.Customer.created_at.desc()).limit(10).all()
     
-    # FDH utilization
-    fdhs = db.query(models.FDH).all()
-    fdh_utilization = []
-    for fdh in fdhs:
-        splitters = db.query(models.Splitter).filter(models.Splitter.fdh_id == fdh.fdh_id).all()
-        total_capacity = sum(s.port_capacity for s in splitters)
-        total_used = sum(s.used_ports for s in splitters)
-        
-        fdh_utilization.append({
-            "fdh_id": fdh.fdh_id,
-            "name": fdh.name,
-            "location": fdh.location,
-            "total_capacity": total_capacity,
-            "used_ports": total_used,
-            "utilization_percent": round((total_used / total_capacity * 100), 2) if total_capacity > 0 else 0
-        })
-    
-    # Available ports summary
-    splitters = db.query(models.Splitter).all()
-    available_ports_summary = {
-        "total_splitters": len(splitters),
-        "total_capacity": sum(s.port_capacity for s in splitters),
-        "total_used": sum(s.used_ports for s in splitters),
-        "total_available": sum(s.port_capacity - s.used_ports for s in splitters)
-    }
+    # FDH utilization page and port summary from one grouped query
+    fdh_total, fdh_utilization, available_ports_summary = crud.get_fdh_utilization(
+        db, region, fdh_skip, fdh_limit
+    )
     
     return {
         "role": "Planner",
         "stats": {
-            "total_assets": total_assets,
-            "available_assets": available_assets,
-            "assigned_assets": assigned_assets,
-            "total_customers": total_customers,
-            "active_customers": active_customers,
-            "pending_customers": pending_customers
+            "total_assets": asset_counts["total_assets"],
+            "available_assets": asset_counts["available_assets"],
+            "assigned_assets": asset_counts["assigned_assets"],
+            **customer_counts
         },
         "recent_onboardings": recent_onboardings,
         "fdh_utilization": fdh_utilization,
+        "fdh_total": fdh_total,
         "available_ports_summary": available_ports_summary
     }
 
 @router.get("/technician/{user_id}")
 def get_technician_dashboard(user_id: int, db: Session = Depends(get_db)):
     """Get dashboard data for Technician role"""
-    from sqlalchemy import func
-    
-    # ✅ FIXED: Get the actual logged-in user
-    user = db.query(models.User).filter(models.User.user_id == user_id).first()
+    user = db.query(models.User.user_id, models.User.username, models.User.role).filter(
+        models.User.user_id == user_id
+    ).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # ✅ FIXED: Find technician by matching username
-    technician = db.query(models.Technician).filter(
-        func.lower(models.Technician.name).contains(func.lower(user.username))
-    ).first()
-    
-    # Fallback: get first technician if no match
-    if not technician:
-        technician = db.query(models.Technician).first()
-    
-    technician_id = technician.technician_id if technician else None
-    
-    # My tasks - only tasks assigned to THIS technician
-    my_tasks = []
-    if technician_id:
-        my_tasks = db.query(models.DeploymentTask).filter(
-            models.DeploymentTask.technician_id == technician_id,
-            models.DeploymentTask.status.in_(['Scheduled', 'InProgress'])
-        ).all()
-    
-    # Unassigned tasks
-    pending_tasks = db.query(models.DeploymentTask).filter(
-        models.DeploymentTask.status == 'Scheduled',
-        models.DeploymentTask.technician_id == None
-    ).limit(10).all()
-    
-    # Recent completions by THIS technician
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_completions = db.query(models.DeploymentTask).filter(
-        models.DeploymentTask.status == 'Completed',
-        models.DeploymentTask.updated_at >= week_ago
+    # Technician linked to this user (Technician.user_id), from the identity map
+    technician_id, technician_name = technician_identities.get(db, user_id) or (None, None)
+    payload = dashboard_cache.get_or_compute(
+        ("technician", technician_id), TECHNICIAN_TABLES,
+        lambda: _technician_payload(db, technician_id, technician_name)
     )
-    if technician_id:
-        recent_completions = recent_completions.filter(
-            models.DeploymentTask.technician_id == technician_id
-        )
-    recent_completions = recent_completions.order_by(
-        models.DeploymentTask.updated_at.desc()
-    ).limit(10).all()
-    
-    # Task stats
-    total_assigned = len(my_tasks)
-    in_progress = len([t for t in my_tasks if t.status == 'InProgress'])
-    scheduled = len([t for t in my_tasks if t.status == 'Scheduled'])
+    return {**payload, "viewer": dict(user._mapping)}
+
+def _technician_payload(db: Session, technician_id: Optional[int], technician_name: Optional[str]):
+    # Open tasks, unassigned tasks and this week's completions in one query
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    tasks = crud.get_technician_dashboard_tasks(db, technician_id, week_ago)
+    my_tasks = tasks["mine"]
     
     return {
         "role": "Technician",
         "technician_id": technician_id,
-        "technician_name": technician.name if technician else "Unknown",
+        "technician_name": technician_name or "Unknown",
         "stats": {
-            "total_assigned_tasks": total_assigned,
-            "in_progress": in_progress,
-            "scheduled": scheduled,
-            "completed_this_week": len(recent_completions)
+            "total_assigned_tasks": len(my_tasks),
+            "in_progress": len([t for t in my_tasks if t.status == 'InProgress']),
+            "scheduled": len([t for t in my_tasks if t.status == 'Scheduled']),
+            "overdue": len([t for t in my_tasks if t.overdue_since is not None]),
+            "completed_this_week": len(tasks["completed"])
         },
         "my_tasks": my_tasks,
-        "pending_tasks": pending_tasks[:5],
-        "recent_completions": recent_completions
+        "pending_tasks": tasks["pending"],
+        "recent_completions": tasks["completed"]
     }
 
 @router.get("/admin/{user_id}")
 def get_admin_dashboard(user_id: int, db: Session = Depends(get_db)):
     """Get dashboard data for Admin role"""
-    # Comprehensive stats
-    total_assets = db.query(models.Asset).count()
-    available_assets = db.query(models.Asset).filter(models.Asset.status == 'Available').count()
-    assigned_assets = db.query(models.Asset).filter(models.Asset.status == 'Assigned').count()
-    faulty_assets = db.query(models.Asset).filter(models.Asset.status == 'Faulty').count()
-    
-    total_customers = db.query(models.Customer).count()
-    active_customers = db.query(models.Customer).filter(models.Customer.status == 'Active').count()
-    pending_customers = db.query(models.Customer).filter(models.Customer.status == 'Pending').count()
-    
-    total_tasks = db.query(models.DeploymentTask).count()
-    pending_tasks = db.query(models.DeploymentTask).filter(
-        models.DeploymentTask.status.in_(['Scheduled', 'InProgress'])
-    ).count()
-    completed_tasks = db.query(models.DeploymentTask).filter(
-        models.DeploymentTask.status == 'Completed'
-    ).count()
+    payload = dashboard_cache.get_or_compute(("admin",), ADMIN_TABLES, lambda: _admin_payload(db))
+    return {**payload, "viewer": _viewer(db, user_id)}
+
+def _admin_payload(db: Session):
+    # One conditional-aggregate query per table
+    stats = crud.get_admin_stats(db)
     
     # Recent audit logs
     recent_audit_logs = db.query(models.AuditLog).order_by(
         models.AuditLog.timestamp.desc()
     ).limit(20).all()
     
-    # User activity summary
+    # User activity summary, users joined in
     week_ago = datetime.utcnow() - timedelta(days=7)
     user_activity = db.query(
         models.AuditLog.user_id,
+        models.User.username,
+        models.User.role,
         func.count(models.AuditLog.log_id).label('action_count')
+    ).outerjoin(
+        models.User, models.AuditLog.user_id == models.User.user_id
     ).filter(
         models.AuditLog.timestamp >= week_ago
-    ).group_by(models.AuditLog.user_id).all()
-    
-    user_activity_summary = []
-    for user_id_val, count in user_activity:
-        user = db.query(models.User).filter(models.User.user_id == user_id_val).first()
-        user_activity_summary.append({
-            "user_id": user_id_val,
-            "username": user.username if user else "Unknown",
-            "role": user.role if user else "Unknown",
-            "actions_this_week": count
-        })
+    ).group_by(
+        models.AuditLog.user_id, models.User.username, models.User.role
+    ).order_by(func.count(models.AuditLog.log_id).desc()).all()
     
-    # System health
-    total_users = db.query(models.User).count()
-    total_technicians = db.query(models.Technician).count()
-    total_fdhs = db.query(models.FDH).count()
-    total_splitters = db.query(models.Splitter).count()
+    user_activity_summary = [
+        {
+            "user_id": row.user_id,
+            "username": row.username or "Unknown",
+            "role": row.role or "Unknown",
+            "actions_this_week": row.action_count
+        }
+        for row in user_activity
+    ]
     
     system_health = {
-        "total_users": total_users,
-        "total_technicians": total_technicians,
-        "total_fdhs": total_fdhs,
-        "total_splitters": total_splitters,
+        **crud.get_system_counts(db),
         "database_status": "healthy",
         "last_backup": "N/A"  # In production, would track actual backups
     }
     
     return {
         "role": "Admin",
-        "stats": {
-            "total_assets": total_assets,
-            "available_assets": available_assets,
-            "assigned_assets": assigned_assets,
-            "faulty_assets": faulty_assets,
-            "total_customers": total_customers,
-            "active_customers": active_customers,
-            "pending_customers": pending_customers,
-            "total_tasks": total_tasks,
-            "pending_tasks": pending_tasks,
-            "completed_tasks": completed_tasks
-        },
+        "stats": stats,
         "recent_audit_logs": recent_audit_logs,
-        "user_activity_summary": sorted(user_activity_summary, key=lambda x: x['actions_this_week'], reverse=True),
+        "user_activity_summary": user_activity_summary,
         "system_health": system_health
     }
 
 @router.get("/support/{user_id}")
 def get_support_dashboard(user_id: int, db: Session = Depends(get_db)):
     """Get dashboard data for Support Agent role"""
-    # Customer stats
-    total_customers = db.query(models.Customer).count()
-    active_customers_list = db.query(models.Customer).filter(
+    payload = dashboard_cache.get_or_compute(("support",), SUPPORT_TABLES, lambda: _support_payload(db))
+    return {**payload, "viewer": _viewer(db, user_id)}
+
+def _support_payload(db: Session):
+    # Status counts from one conditional aggregate; Active/Pending/Inactive partition live customers
+    counts = crud.get_customer_counts(db)
+    inactive_customers = counts["total_customers"] - counts["active_customers"] - counts["pending_customers"]
+    
+    active_customers_list = crud.live_customers(db).filter(
         models.Customer.status == 'Active'
     ).order_by(models.Customer.created_at.desc()).limit(20).all()
     
-    pending_customers_list = db.query(models.Customer).filter(
+    # Longest-waiting first
+    pending_customers_list = crud.live_customers(db).filter(
         models.Customer.status == 'Pending'
-    ).all()
-    
-    inactive_customers = db.query(models.Customer).filter(
-        models.Customer.status == 'Inactive'
-    ).count()
+    ).order_by(models.Customer.created_at).limit(20).all()
     
-    # Recent deactivations
+    # Deactivations come from recorded status events
     week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_deactivations = db.query(models.Customer).filter(
-        models.Customer.status == 'Inactive'
-    ).order_by(models.Customer.customer_id.desc()).limit(10).all()
-    
-    recent_deactivations_data = []
-    for customer in recent_deactivations:
-        # Count reclaimed assets
-        reclaimed_count = db.query(models.Asset).filter(
-            models.Asset.status == 'Available'
-            # Would need better tracking of reclaimed assets in production
-        ).count()
-        
-        recent_deactivations_data.append({
-            "customer_id": customer.customer_id,
-            "name": customer.name,
-            "deactivation_date": customer.created_at,  # In production, track actual deactivation date
-            "reclaimed_assets": 0  # Would calculate from history
-        })
+    deactivations_this_week = crud.get_deactivation_counts(db, week_ago)
     
     return {
         "role": "SupportAgent",
         "stats": {
-            "total_customers": total_customers,
-            "active_customers": len(active_customers_list),
-            "pending_customers": len(pending_customers_list),
-            "inactive_customers": inactive_customers
+            **counts,
+            "inactive_customers": inactive_customers,
+            "deactivations_this_week": deactivations_this_week["deactivations"],
+            "reclaimed_assets_this_week": deactivations_this_week["reclaimed_assets"]
         },
         "active_customers": active_customers_list,
         "pending_customers": pending_customers_list,
-        "recent_deactivations": recent_deactivations_data
-    }
\ No newline at end of file
+        "recent_deactivations": crud.get_recent_deactivations(db)
+    }
+
+# Live dashboards: one shared view per role (and region/technician), rebuilt
+# once after each relevant commit and streamed to every subscriber as deltas
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+def _live_view(build):
+    def run(scope):
+        db = SessionLocal()
+        try:
+            return build(db, scope)
+        finally:
+            db.close()
+    return run
+
+def _live_planner(db: Session, region):
+    return dashboard_cache.get_or_compute(
+        ("planner", region, 0, 100), PLANNER_TABLES, lambda: _planner_payload(db, region, 0, 100)
+    )
+
+def _live_technician(db: Session, technician_id):
+    def compute():
+        name = db.query(models.Technician.name).filter(
+            models.Technician.technician_id == technician_id
+        ).scalar()
+        return _technician_payload(db, technician_id if name else None, name)
+    return dashboard_cache.get_or_compute(("technician", technician_id), TECHNICIAN_TABLES, compute)
+
+views.register("planner", PLANNER_TABLES, _live_view(_live_planner), keys={
+    "recent_onboardings": "customer_id", "fdh_utilization": "fdh_id"
+})
+views.register("technician", TECHNICIAN_TABLES, _live_view(_live_technician), keys={
+    "my_tasks": "task_id", "pending_tasks": "task_id", "recent_completions": "task_id"
+})
+views.register("admin", ADMIN_TABLES, _live_view(
+    lambda db, _: dashboard_cache.get_or_compute(("admin",), ADMIN_TABLES, lambda: _admin_payload(db))
+), keys={"recent_audit_logs": "log_id", "user_activity_summary": "user_id"})
+views.register("support", SUPPORT_TABLES, _live_view(
+    lambda db, _: dashboard_cache.get_or_compute(("support",), SUPPORT_TABLES, lambda: _support_payload(db))
+), keys={"active_customers": "customer_id", "pending_customers": "customer_id", "recent_deactivations": "event_id"})
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@router.get("/stream/{role}")
+async def stream_dashboard(
+    role: str,
+    request: Request,
+    region: Optional[str] = Query(None, description="Planner: limit FDH utilization to a region"),
+    technician_id: Optional[int] = Query(None, description="Technician: whose tasks to follow")
+):
+    """
+    Server-Sent Events stream of a role dashboard: a `snapshot` event with
+    the full payload, then `delta` events carrying only what changed
+    (changed stats, upserted/removed list entries).
+    """
+    if role not in ("planner", "technician", "admin", "support"):
+        raise HTTPException(status_code=404, detail="Unknown dashboard role")
+    if role == "technician" and technician_id is None:
+        raise HTTPException(status_code=400, detail="technician_id is required for the technician stream")
+    scope = {"planner": region, "technician": technician_id}.get(role)
+    key = (role, scope)
+
+    async def stream():
+        # Subscribe and watch only once the response is being iterated, so a
+        # client that disconnects before the body starts leaks nothing.
+        # Subscribing before taking the snapshot means no delta is missed; a
+        # delta already reflected in the snapshot is harmless to reapply
+        subscription = events.bus.subscribe(["live"], lambda event: event["key"] == key)
+        try:
+            snapshot = await run_in_threadpool(views.watch, key)
+        except BaseException:
+            events.bus.unsubscribe(subscription)
+            raise
+        try:
+            yield _sse("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse("delta", {"timestamp": event["timestamp"], **event["delta"]})
+        finally:
+            events.bus.unsubscribe(subscription)
+            views.unwatch(key)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
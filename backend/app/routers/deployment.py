@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body  # ✅ Body imported here
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, WebSocket, WebSocketDisconnect, Request, Response  # ✅ Body imported here
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
+import asyncio
+import gzip
+import hashlib
+import json
 from typing import List, Optional
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from pydantic import BaseModel  # ✅ BaseModel imported here
-from .. import crud, schemas, models
+from .. import crud, schemas, models, scheduler, events, rollups, routing
 from ..database import get_db
 
 router = APIRouter(prefix="/deployment", tags=["deployment"])
@@ -16,6 +21,25 @@ class TaskStatusUpdate(BaseModel):
     status: str
     notes: Optional[str] = None
 
+def _publish_task_events(db: Session, task_ids: List[int], event: str, context: Optional[dict] = None, **extra):
+    """Publish committed task changes to live subscribers (WebSocket clients)"""
+    if context is None:
+        context = crud.get_task_event_context(db, task_ids)
+    for task_id in task_ids:
+        row = context.get(task_id)
+        if row is None:
+            continue
+        events.bus.publish("task", {
+            "event": event,
+            "task_id": row.task_id,
+            "customer_id": row.customer_id,
+            "technician_id": row.technician_id,
+            "status": row.status,
+            "scheduled_date": row.scheduled_date,
+            "region": row.region,
+            **extra
+        })
+
 # Technician Endpoints
 @router.post("/technicians", response_model=schemas.Technician)
 def create_technician(technician: schemas.TechnicianCreate, db: Session = Depends(get_db)):
@@ -82,12 +106,96 @@ def create_deployment_task(
         if not tech:
             raise HTTPException(status_code=404, detail="Technician not found")
     
-    db_task = models.DeploymentTask(**task.dict())
+    db_task = models.DeploymentTask(**task.dict(exclude={"notes"}))
     db.add(db_task)
+    db.flush()
+    if task.notes:
+        crud.add_task_note(db, db_task.task_id, task.notes)
     db.commit()
     db.refresh(db_task)
+    _publish_task_events(db, [db_task.task_id], "created")
     return db_task
 
+@router.post("/tasks/bulk")
+def bulk_create_deployment_tasks(request: schemas.BulkTaskCreateRequest, db: Session = Depends(get_db)):
+    """
+    Create deployment tasks for pending customers (by IDs and/or filter) that
+    have no open task, optionally handing them straight to auto-assignment.
+    """
+    if request.customer_ids is None and not request.neighborhood and not request.splitter_id:
+        raise HTTPException(status_code=400, detail="Provide customer_ids or at least one filter")
+    
+    if request.technician_id:
+        tech = db.query(models.Technician.technician_id).filter(
+            models.Technician.technician_id == request.technician_id
+        ).first()
+        if not tech:
+            raise HTTPException(status_code=404, detail="Technician not found")
+    
+    eligible = crud.find_customers_without_open_task(
+        db, request.customer_ids, request.neighborhood, request.splitter_id
+    )
+    try:
+        created = crud.bulk_create_tasks(
+            db, eligible, request.technician_id, request.scheduled_date, request.notes
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating tasks: {str(e)}")
+    
+    assignment = None
+    if request.auto_assign and not request.technician_id and created:
+        assignment = scheduler.auto_assign_tasks(db, task_ids=list(created.values()))
+    _publish_task_events(db, list(created.values()), "created")
+    
+    skipped = []
+    if request.customer_ids is not None:
+        skipped = [customer_id for customer_id in request.customer_ids if customer_id not in created]
+    
+    return {
+        "message": f"Created {len(created)} deployment tasks",
+        "created": len(created),
+        "tasks": [{"customer_id": c, "task_id": t} for c, t in created.items()],
+        "skipped_customer_ids": skipped,
+        "assignment": assignment
+    }
+
+@router.post("/tasks/auto-assign")
+def auto_assign_tasks(request: schemas.AutoAssignRequest, db: Session = Depends(get_db)):
+    """
+    Assign unassigned Scheduled tasks to technicians by region, daily capacity
+    and current open load. Use dry_run to preview without saving.
+    """
+    try:
+        result = scheduler.auto_assign_tasks(db, request.task_ids, request.region, request.dry_run)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error assigning tasks: {str(e)}")
+    
+    if not request.dry_run:
+        _publish_task_events(db, [a["task_id"] for a in result["assignments"]], "assigned")
+    return result
+
+@router.get("/overdue")
+def get_overdue_tasks(
+    technician_id: Optional[int] = Query(None),
+    region: Optional[str] = Query(None),
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    db: Session = Depends(get_db)
+):
+    """Tasks flagged overdue by the sweeper (see the sweep-overdue-tasks job)"""
+    total, tasks = crud.get_overdue_task_list(db, technician_id, region, skip, limit)
+    return {
+        "total_overdue": total,
+        "tasks": [schemas.TechnicianTaskItem(**t) for t in tasks]
+    }
+
+@router.post("/overdue/sweep")
+def sweep_overdue_tasks(db: Session = Depends(get_db)):
+    """Run the overdue sweep now"""
+    result = crud.sweep_overdue_tasks(db)
+    _publish_task_events(db, result["flagged"], "overdue")
+    return {"flagged": len(result["flagged"]), "cleared": len(result["cleared"])}
+
 @router.get("/tasks", response_model=List[schemas.DeploymentTask])
 def get_deployment_tasks(
     skip: int = 0,
@@ -107,42 +215,27 @@ def get_deployment_tasks(
     return query.offset(skip).limit(limit).all()
 
 @router.get("/tasks/{task_id}")
-def get_deployment_task_details(task_id: int, db: Session = Depends(get_db)):
+def get_deployment_task_details(
+    task_id: int,
+    notes_limit: int = Query(5, ge=0, le=50, description="Number of latest notes to include"),
+    db: Session = Depends(get_db)
+):
     """Get deployment task with customer and technician details"""
-    task = db.query(models.DeploymentTask).filter(
-        models.DeploymentTask.task_id == task_id
-    ).first()
-    
-    if not task:
+    details = crud.get_task_details(db, task_id)
+    if not details:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    customer = crud.get_customer(db, task.customer_id)
-    
-    assigned_assets = db.query(models.AssignedAssets).filter(
-        models.AssignedAssets.customer_id == task.customer_id
-    ).all()
-    assets = [assignment.asset for assignment in assigned_assets]
-    
-    splitter = None
-    fdh = None
-    if customer.splitter_id:
-        splitter = crud.get_splitter(db, customer.splitter_id)
-        if splitter and splitter.fdh_id:
-            fdh = crud.get_fdh(db, splitter.fdh_id)
-    
-    technician = None
-    if task.technician_id:
-        technician = db.query(models.Technician).filter(
-            models.Technician.technician_id == task.technician_id
-        ).first()
+    notes = crud.get_task_notes(db, task_id, 0, notes_limit + 1) if notes_limit else []
     
     return {
-        "task": task,
-        "customer": customer,
-        "assets": assets,
-        "splitter": splitter,
-        "fdh": fdh,
-        "technician": technician
+        "notes": [schemas.TaskNote.model_validate(n) for n in notes[:notes_limit]],
+        "has_more_notes": len(notes) > notes_limit,
+        "task": schemas.DeploymentTask.model_validate(details["task"]),
+        "customer": schemas.Customer.model_validate(details["customer"]),
+        "assets": [schemas.Asset.model_validate(a) for a in details["assets"]],
+        "splitter": schemas.Splitter.model_validate(details["splitter"]) if details["splitter"] else None,
+        "fdh": schemas.FDH.model_validate(details["fdh"]) if details["fdh"] else None,
+        "technician": schemas.Technician.model_validate(details["technician"]) if details["technician"] else None
     }
 
 @router.patch("/tasks/{task_id}", response_model=schemas.DeploymentTask)
@@ -160,18 +253,24 @@ def update_deployment_task(
         raise HTTPException(status_code=404, detail="Task not found")
     
     update_data = task_update.dict(exclude_unset=True)
+    new_note = update_data.pop("notes", None)
+    new_status = update_data.pop("status", None)
+    previous_technician_id = task.technician_id
     for key, value in update_data.items():
         setattr(task, key, value)
+    if new_note:
+        crud.add_task_note(db, task.task_id, new_note, new_status)
     
-    task.updated_at = datetime.utcnow()
-    
-    if task_update.status == "Completed":
-        customer = crud.get_customer(db, task.customer_id)
-        if customer:
-            customer.status = "Active"
+    crud.set_task_status(db, task, new_status or task.status)
+    if previous_technician_id is not None and task.technician_id != previous_technician_id:
+        # The task leaves the previous technician's synced view
+        crud.record_tombstones(db, 'DeploymentTask', [task.task_id], technician_id=previous_technician_id)
     
     db.commit()
     db.refresh(task)
+    
+    event = "assigned" if task.technician_id != previous_technician_id else "updated"
+    _publish_task_events(db, [task.task_id], event, previous_technician_id=previous_technician_id)
     return task
 
 @router.patch("/tasks/{task_id}/status")
@@ -195,23 +294,14 @@ def update_task_status(
             detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
         )
     
-    task.status = status_update.status
-    task.updated_at = datetime.utcnow()
+    crud.set_task_status(db, task, status_update.status)
     
     if status_update.notes:
-        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        if task.notes:
-            task.notes = f"{task.notes}\n\n[{timestamp}] Status: {status_update.status}\n{status_update.notes}"
-        else:
-            task.notes = f"[{timestamp}] Status: {status_update.status}\n{status_update.notes}"
-    
-    if status_update.status == "Completed":
-        customer = crud.get_customer(db, task.customer_id)
-        if customer:
-            customer.status = "Active"
+        crud.add_task_note(db, task.task_id, status_update.notes, status_update.status)
     
     db.commit()
     db.refresh(task)
+    _publish_task_events(db, [task.task_id], "status_changed", note=status_update.notes)
     
     return {
         "message": "Task status updated successfully",
@@ -224,7 +314,7 @@ def add_task_notes(
     notes_request: TaskNotesRequest = Body(...),  # ✅ FIXED
     db: Session = Depends(get_db)
 ):
-    """Add or append notes to a deployment task"""
+    """Append a note to a deployment task"""
     task = db.query(models.DeploymentTask).filter(
         models.DeploymentTask.task_id == task_id
     ).first()
@@ -232,17 +322,27 @@ def add_task_notes(
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-    if task.notes:
-        task.notes = f"{task.notes}\n\n[{timestamp}]\n{notes_request.notes}"
-    else:
-        task.notes = f"[{timestamp}]\n{notes_request.notes}"
-    
+    note = crud.add_task_note(db, task_id, notes_request.notes)
     task.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(task)
+    db.refresh(note)
+    _publish_task_events(db, [task_id], "note_added", note=note.body)
     
-    return {"message": "Notes added successfully", "task": task}
+    return {
+        "message": "Notes added successfully",
+        "task": schemas.DeploymentTask.model_validate(task),
+        "note": schemas.TaskNote.model_validate(note)
+    }
+
+@router.get("/tasks/{task_id}/notes", response_model=List[schemas.TaskNote])
+def get_task_notes(
+    task_id: int,
+    skip: int = 0,
+    limit: int = Query(20, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get a task's notes, newest first"""
+    return crud.get_task_notes(db, task_id, skip, limit)
 
 @router.delete("/tasks/{task_id}")
 def delete_deployment_task(task_id: int, db: Session = Depends(get_db)):
@@ -254,63 +354,197 @@ def delete_deployment_task(task_id: int, db: Session = Depends(get_db)):
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    context = crud.get_task_event_context(db, [task_id])
+    db.query(models.TaskNote).filter(
+        models.TaskNote.task_id == task_id
+    ).delete(synchronize_session=False)
     db.delete(task)
+    crud.record_tombstones(db, 'DeploymentTask', [task_id])
     db.commit()
+    _publish_task_events(db, [task_id], "deleted", context=context)
     return {"message": "Task deleted successfully"}
 
-@router.get("/technicians/{technician_id}/tasks")
+@router.websocket("/ws/tasks")
+async def task_updates_socket(
+    websocket: WebSocket,
+    technician_id: Optional[int] = None,
+    region: Optional[str] = None
+):
+    """
+    Push task changes to connected clients. Filter with technician_id (also
+    receives tasks reassigned away from that technician) and/or region.
+    """
+    def wanted(event: dict) -> bool:
+        if technician_id is not None and technician_id not in (
+            event.get("technician_id"), event.get("previous_technician_id")
+        ):
+            return False
+        return region is None or event.get("region") == region
+    
+    await websocket.accept()
+    subscription = events.bus.subscribe(["task"], wanted)
+    
+    async def forward():
+        while True:
+            event = await subscription.queue.get()
+            await websocket.send_json(jsonable_encoder(event))
+    
+    sender = asyncio.create_task(forward())
+    try:
+        # Client messages are ignored; receiving only detects disconnects
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        events.bus.unsubscribe(subscription)
+
+@router.get("/technicians/{technician_id}/tasks", response_model=List[schemas.TechnicianTaskItem])
 def get_technician_tasks(
     technician_id: int,
     status: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None, description="Earliest scheduled date"),
+    date_to: Optional[date] = Query(None, description="Latest scheduled date"),
     db: Session = Depends(get_db)
 ):
     """Get all tasks assigned to a specific technician"""
-    query = db.query(models.DeploymentTask).filter(
-        models.DeploymentTask.technician_id == technician_id
-    )
-    
-    if status:
-        query = query.filter(models.DeploymentTask.status == status)
-    
-    tasks = query.all()
-    
-    result = []
-    for task in tasks:
-        customer = crud.get_customer(db, task.customer_id)
-        result.append({
-            "task": task,
-            "customer": customer
-        })
+    return crud.get_technician_task_list(db, technician_id, status, date_from, date_to)
+
+@router.get("/technicians/{technician_id}/route")
+def get_technician_route(
+    technician_id: int,
+    day: Optional[date] = Query(None, description="Defaults to today"),
+    start_lat: Optional[float] = Query(None, ge=-90, le=90),
+    start_lng: Optional[float] = Query(None, ge=-180, le=180),
+    include_overdue: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Order a technician's open tasks for the day into a driving itinerary"""
+    tech = db.query(models.Technician.technician_id, models.Technician.name).filter(
+        models.Technician.technician_id == technician_id
+    ).first()
+    if not tech:
+        raise HTTPException(status_code=404, detail="Technician not found")
+    if (start_lat is None) != (start_lng is None):
+        raise HTTPException(status_code=400, detail="Provide both start_lat and start_lng")
     
-    return result
+    day = day or date.today()
+    start = (start_lat, start_lng) if start_lat is not None else None
+    rows = routing.get_route_stops(db, day, technician_id=technician_id, include_overdue=include_overdue)
+    return {
+        "technician_id": tech.technician_id,
+        "technician_name": tech.name,
+        "day": day,
+        **routing.build_itinerary(rows, start)
+    }
 
-@router.get("/my-tasks/{user_id}")
-def get_my_tasks(user_id: int, db: Session = Depends(get_db)):
-    """Get tasks for the logged-in technician user"""
-    technician = db.query(models.Technician).filter(
-        models.Technician.user_id == user_id
+@router.get("/technicians/{technician_id}/bundle")
+def get_technician_bundle(
+    technician_id: int,
+    request: Request,
+    day: Optional[date] = Query(None, description="Defaults to today"),
+    include_overdue: bool = True,
+    db: Session = Depends(get_db)
+):
+    """
+    Offline day bundle: tasks, customers, topology chain, assigned devices,
+    splitter ports and notes in one gzip payload. Send the returned ETag as
+    If-None-Match to get 304 Not Modified when nothing changed.
+    """
+    tech = db.query(models.Technician).filter(
+        models.Technician.technician_id == technician_id
     ).first()
+    if not tech:
+        raise HTTPException(status_code=404, detail="Technician not found")
     
-    if not technician:
+    day = day or date.today()
+    data = crud.get_technician_bundle(db, technician_id, day, include_overdue)
+    
+    ports = {}
+    for splitter_id, port, customer_id in data["ports"]:
+        ports.setdefault(splitter_id, []).append({"port": port, "customer_id": customer_id})
+    
+    payload = jsonable_encoder({
+        "technician": schemas.Technician.model_validate(tech),
+        "day": day,
+        "tasks": [schemas.DeploymentTask.model_validate(t) for t in data["tasks"]],
+        "customers": [schemas.Customer.model_validate(c) for c in data["customers"]],
+        "assets": [
+            {"customer_id": customer_id, **schemas.Asset.model_validate(asset).model_dump()}
+            for customer_id, asset in data["assets"]
+        ],
+        "fiber_lines": [
+            {
+                "line_id": line.line_id,
+                "from_splitter_id": line.from_splitter_id,
+                "to_customer_id": line.to_customer_id,
+                "length_meters": float(line.length_meters) if line.length_meters is not None else None,
+                "status": line.status
+            }
+            for line in data["fiber_lines"]
+        ],
+        "splitters": [
+            {
+                **schemas.Splitter.model_validate(s).model_dump(),
+                "occupied_ports": ports.get(s.splitter_id, []),
+                "free_ports": [
+                    p for p in range(1, s.port_capacity + 1)
+                    if p not in {o["port"] for o in ports.get(s.splitter_id, [])}
+                ]
+            }
+            for s in data["splitters"]
+        ],
+        "fdhs": [schemas.FDH.model_validate(f) for f in data["fdhs"]],
+        "headends": [schemas.Headend.model_validate(h) for h in data["headends"]],
+        "notes": [schemas.TaskNote.model_validate(n) for n in data["notes"]]
+    })
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    etag = f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/routes")
+def get_region_routes(
+    day: Optional[date] = Query(None, description="Defaults to today"),
+    region: Optional[str] = Query(None),
+    include_overdue: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Plan itineraries for every technician with tasks in a region"""
+    day = day or date.today()
+    routes = routing.plan_region_routes(db, day, region, include_overdue)
+    return {
+        "day": day,
+        "region": region,
+        "technicians": len(routes),
+        "routes": routes
+    }
+
+@router.get("/my-tasks/{user_id}", response_model=List[schemas.TechnicianTaskItem])
+def get_my_tasks(
+    user_id: int,
+    status: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None, description="Earliest scheduled date"),
+    date_to: Optional[date] = Query(None, description="Latest scheduled date"),
+    db: Session = Depends(get_db)
+):
+    """Get tasks for the logged-in technician user"""
+    tasks = crud.get_user_task_list(db, user_id, status, date_from, date_to)
+    if tasks is None:
         raise HTTPException(
             status_code=404, 
             detail="No technician profile found for this user. Please contact admin to link your account."
         )
-    
-    tasks = db.query(models.DeploymentTask).filter(
-        models.DeploymentTask.technician_id == technician.technician_id
-    ).all()
-    
-    result = []
-    for task in tasks:
-        customer = crud.get_customer(db, task.customer_id)
-        result.append({
-            "task": task,
-            "customer": customer,
-            "technician": technician
-        })
-    
-    return result
+    return tasks
 
 @router.get("/stats/summary")
 def get_deployment_stats(db: Session = Depends(get_db)):
@@ -331,4 +565,39 @@ def get_deployment_stats(db: Session = Depends(get_db)):
     return {
         "total_tasks": total,
         "by_status": summary
-    }
\ No newline at end of file
+    }
+
+@router.get("/stats/rollups")
+def get_deployment_rollups(
+    date_from: Optional[date] = Query(None, description="Defaults to 30 days before date_to"),
+    date_to: Optional[date] = Query(None, description="Defaults to today"),
+    technician_id: Optional[int] = Query(None, description="0 = unassigned"),
+    region: Optional[str] = Query(None),
+    group_by: Optional[str] = Query("day", pattern="^(day|technician|region|none)$"),
+    db: Session = Depends(get_db)
+):
+    """Completions, failure rate and lead-time distribution from the daily rollups"""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must be on or before date_to")
+    
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "group_by": group_by,
+        "results": rollups.query_rollups(db, date_from, date_to, technician_id, region, group_by)
+    }
+
+@router.post("/stats/rollups/rebuild")
+def rebuild_deployment_rollups(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Recompute daily rollups from task history (all dates by default)"""
+    try:
+        return rollups.rebuild_rollups(db, date_from, date_to)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error rebuilding rollups: {str(e)}")
\ No newline at end of file
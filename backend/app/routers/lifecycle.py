@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from .. import crud, schemas, models
+from ..coalesce import coalesce_requests
 from ..database import get_db
 import datetime as datetime
 
@@ -81,6 +82,7 @@ def get_asset_lifecycle_details(asset_id: int, db: Session = Depends(get_db)):
     return result
 
 @router.get("/stats/utilization")
+@coalesce_requests("lifecycle.utilization")
 def get_asset_utilization_stats(db: Session = Depends(get_db)):
     """Get asset utilization statistics by type"""
     return crud.get_asset_utilization_stats(db)
@@ -101,7 +103,7 @@ def get_assets_due_for_maintenance(
 @router.get("/inactive-customers")
 def get_inactive_customers(db: Session = Depends(get_db)):
     """Get all inactive customers with reclaimable assets"""
-    customers = db.query(models.Customer).filter(
+    customers = crud.live_customers(db).filter(
         models.Customer.status == 'Inactive'
     ).all()
     
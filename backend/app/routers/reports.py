@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import reports
+from ..database import get_db
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+@router.get("/")
+def list_report_snapshots(
+    report: Optional[str] = Query(None),
+    limit: int = Query(30, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Available reports and their stored snapshots (metadata only)"""
+    return {"reports": list(reports.REPORTS), "snapshots": reports.list_snapshots(db, report, limit)}
+
+@router.post("/generate")
+def generate_report_snapshots(
+    report: Optional[List[str]] = Query(None, description="Reports to generate; all by default"),
+    db: Session = Depends(get_db)
+):
+    """Generate report snapshots now instead of waiting for the nightly job"""
+    unknown = [name for name in report or [] if name not in reports.REPORTS]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown report(s): {', '.join(unknown)}")
+    try:
+        return reports.generate_snapshots(db, report)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error generating reports: {str(e)}")
+
+@router.get("/{report}")
+def get_report(
+    report: str,
+    snapshot_id: Optional[int] = Query(None, description="A specific snapshot; latest by default"),
+    db: Session = Depends(get_db)
+):
+    """Serve a stored report snapshot with its generation time"""
+    if report not in reports.REPORTS:
+        raise HTTPException(status_code=404, detail="Unknown report")
+    snapshot = reports.get_snapshot(db, report, snapshot_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="No snapshot generated yet for this report")
+    return {
+        "report": snapshot.report,
+        "snapshot_id": snapshot.snapshot_id,
+        "period_start": snapshot.period_start,
+        "period_end": snapshot.period_end,
+        "generated_at": snapshot.generated_at,
+        "duration_ms": snapshot.duration_ms,
+        "data": snapshot.payload
+    }
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from .. import crud, schemas, models
+from ..database import get_db
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+@router.get("/")
+def get_changes(
+    since: Optional[int] = Query(None, description="Token from the previous sync; omit for a full download"),
+    technician_id: Optional[int] = Query(None, description="Limit to this technician's tasks and their customers"),
+    limit: int = Query(500, ge=1, le=5000),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page, when it returned one"),
+    db: Session = Depends(get_db)
+):
+    """
+    Tasks, customers and assets changed since a sync token, plus tombstones
+    for deleted rows. Repeat with the returned token (and cursor, if any)
+    while has_more is true.
+    """
+    if technician_id is not None:
+        tech = db.query(models.Technician.technician_id).filter(
+            models.Technician.technician_id == technician_id
+        ).first()
+        if not tech:
+            raise HTTPException(status_code=404, detail="Technician not found")
+    
+    try:
+        changes = crud.get_sync_changes(db, since, technician_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "token": changes["token"],
+        "has_more": changes["has_more"],
+        "cursor": changes["cursor"],
+        "tasks": [schemas.DeploymentTask.model_validate(t) for t in changes["tasks"]],
+        "customers": [schemas.Customer.model_validate(c) for c in changes["customers"]],
+        "assets": [schemas.Asset.model_validate(a) for a in changes["assets"]],
+        "tombstones": [
+            {"entity": t.entity, "id": t.entity_id, "row_version": t.row_version}
+            for t in changes["tombstones"]
+        ]
+    }
+
+@router.post("/")
+def push_changes(request: schemas.SyncPushRequest, db: Session = Depends(get_db)):
+    """
+    Upload queued offline edits in one batch. Each change reports applied,
+    conflict (with the server copy), rejected or not_found.
+    """
+    try:
+        results = crud.apply_sync_changes(db, request.changes, request.technician_id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error applying changes: {str(e)}")
+    
+    return {
+        "token": crud.get_sync_token(db),
+        "applied": sum(1 for r in results if r["status"] == "applied"),
+        "conflicts": sum(1 for r in results if r["status"] == "conflict"),
+        "results": results
+    }
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List
-from .. import crud, schemas
+from typing import List, Optional
+from .. import crud, schemas, models
 from ..database import get_db
 
 router = APIRouter(prefix="/topology", tags=["topology"])
@@ -79,6 +81,11 @@ def get_splitters(
     """Get all splitters, optionally filtered by FDH"""
     return crud.get_splitters(db, fdh_id, skip, limit)
 
+@router.post("/splitters/reconcile-ports")
+def reconcile_splitter_ports(dry_run: bool = False, db: Session = Depends(get_db)):
+    """Recompute used_ports for all splitters and report (and optionally fix) drift"""
+    return crud.reconcile_splitter_used_ports(db, apply=not dry_run)
+
 @router.get("/splitters/{splitter_id}", response_model=schemas.Splitter)
 def get_splitter(splitter_id: int, db: Session = Depends(get_db)):
     """Get a specific splitter"""
@@ -98,10 +105,19 @@ def get_customers(
     skip: int = 0,
     limit: int = 100,
     status: str = None,
+    fields: Optional[str] = Query(None, description='Comma-separated fields to return, e.g. "name,splitter_id"; customer_id is always included'),
     db: Session = Depends(get_db)
 ):
-    """Get all customers"""
-    return crud.get_customers(db, skip, limit, status)
+    """Get all customers; `fields` selects only those columns"""
+    try:
+        columns = crud.sparse_columns(models.Customer, schemas.Customer, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    customers = crud.get_customers(db, skip, limit, status, columns)
+    if columns:
+        return JSONResponse(jsonable_encoder([row._asdict() for row in customers]))
+    return customers
 
 @router.get("/customers/{customer_id}", response_model=schemas.Customer)
 def get_customer(customer_id: int, db: Session = Depends(get_db)):
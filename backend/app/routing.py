@@ -0,0 +1,199 @@
+"""
+Technician route planning.
+
+Orders a day's task stops with a nearest-neighbor tour improved by 2-opt
+over great-circle distances. Stop coordinates come from the customer, or
+fall back to its splitter and then its FDH. Stops without coordinates are
+appended after the routed ones in scheduled order.
+"""
+import math
+import time
+from collections import defaultdict
+from datetime import date
+from typing import List, Optional, Tuple
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from . import models
+
+EARTH_RADIUS_KM = 6371.0
+ROUTABLE_STATUSES = ['Scheduled', 'InProgress']
+
+def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+def _nearest_neighbor(dist: List[List[float]], start: int) -> List[int]:
+    n = len(dist)
+    visited = [False] * n
+    visited[start] = True
+    order = [start]
+    current = start
+    for _ in range(n - 1):
+        row = dist[current]
+        best, best_d = -1, math.inf
+        for j in range(n):
+            if not visited[j] and row[j] < best_d:
+                best, best_d = j, row[j]
+        visited[best] = True
+        order.append(best)
+        current = best
+    return order
+
+def _two_opt(order: List[int], dist: List[List[float]], time_budget: float) -> List[int]:
+    """Improve an open path in place; order[0] stays fixed as the start"""
+    n = len(order)
+    deadline = time.perf_counter() + time_budget
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            d_ab = dist[a][b]
+            for k in range(i + 1, n):
+                c = order[k]
+                if k + 1 < n:
+                    d = order[k + 1]
+                    delta = dist[a][c] + dist[b][d] - d_ab - dist[c][d]
+                else:
+                    # Open path: the last edge simply disappears
+                    delta = dist[a][c] - d_ab
+                if delta < -1e-9:
+                    order[i:k + 1] = reversed(order[i:k + 1])
+                    b = order[i]
+                    d_ab = dist[a][b]
+                    improved = True
+    return order
+
+def plan_route(
+    points: List[Tuple[float, float]],
+    start: Optional[Tuple[float, float]] = None,
+    time_budget: float = 0.2
+) -> Tuple[List[int], List[float]]:
+    """
+    Order points into a short open path. Returns (indices in visiting
+    order, leg distance in km to each stop). Without a start location the
+    path begins at the point farthest from the centroid.
+    """
+    if not points:
+        return [], []
+
+    nodes = ([start] if start else []) + list(points)
+    dist = [[haversine_km(p, q) for q in nodes] for p in nodes]
+
+    if start:
+        first = 0
+    else:
+        centroid = (sum(p[0] for p in nodes) / len(nodes), sum(p[1] for p in nodes) / len(nodes))
+        first = max(range(len(nodes)), key=lambda i: haversine_km(nodes[i], centroid))
+
+    order = _two_opt(_nearest_neighbor(dist, first), dist, time_budget)
+
+    legs = [dist[prev][cur] for prev, cur in zip(order, order[1:])]
+    if start:
+        return [i - 1 for i in order[1:]], legs
+    return order, [0.0] + legs
+
+def get_route_stops(
+    db: Session,
+    day: date,
+    technician_id: Optional[int] = None,
+    region: Optional[str] = None,
+    include_overdue: bool = True
+):
+    """Open tasks for a day (plus overdue ones) with resolved coordinates, in one query"""
+    Task = models.DeploymentTask
+    latitude = func.coalesce(models.Customer.latitude, models.Splitter.latitude, models.FDH.latitude)
+    longitude = func.coalesce(models.Customer.longitude, models.Splitter.longitude, models.FDH.longitude)
+
+    day_filter = Task.scheduled_date == day
+    if include_overdue:
+        day_filter = or_(day_filter, Task.overdue_since.isnot(None))
+
+    query = db.query(
+        Task.task_id, Task.technician_id, Task.status, Task.scheduled_date, Task.overdue_since,
+        models.Customer.customer_id, models.Customer.name, models.Customer.address,
+        models.FDH.region, latitude.label("latitude"), longitude.label("longitude")
+    ).join(
+        models.Customer, Task.customer_id == models.Customer.customer_id
+    ).outerjoin(
+        models.Splitter, models.Customer.splitter_id == models.Splitter.splitter_id
+    ).outerjoin(
+        models.FDH, models.Splitter.fdh_id == models.FDH.fdh_id
+    ).filter(
+        Task.status.in_(ROUTABLE_STATUSES),
+        models.Customer.deleted_at.is_(None),
+        day_filter
+    )
+    if technician_id is not None:
+        query = query.filter(Task.technician_id == technician_id)
+    else:
+        query = query.filter(Task.technician_id.isnot(None))
+    if region:
+        query = query.filter(models.FDH.region == region)
+
+    return query.order_by(Task.scheduled_date, Task.task_id).all()
+
+def _stop(row, sequence: Optional[int], leg_km: Optional[float]):
+    return {
+        "sequence": sequence,
+        "task_id": row.task_id,
+        "status": row.status,
+        "scheduled_date": row.scheduled_date,
+        "overdue": row.overdue_since is not None,
+        "customer_id": row.customer_id,
+        "customer_name": row.name,
+        "address": row.address,
+        "region": row.region,
+        "latitude": float(row.latitude) if row.latitude is not None else None,
+        "longitude": float(row.longitude) if row.longitude is not None else None,
+        "leg_km": round(leg_km, 3) if leg_km is not None else None,
+    }
+
+def build_itinerary(rows, start: Optional[Tuple[float, float]] = None, time_budget: float = 0.2):
+    """Ordered itinerary for one technician's stops"""
+    located = [row for row in rows if row.latitude is not None and row.longitude is not None]
+    unlocated = [row for row in rows if row.latitude is None or row.longitude is None]
+
+    points = [(float(row.latitude), float(row.longitude)) for row in located]
+    order, legs = plan_route(points, start, time_budget)
+
+    stops = [_stop(located[i], seq, leg) for seq, (i, leg) in enumerate(zip(order, legs), start=1)]
+    stops += [_stop(row, len(stops) + n, None) for n, row in enumerate(unlocated, start=1)]
+    return {
+        "total_distance_km": round(sum(legs), 3),
+        "stops": stops,
+        "unlocated_stops": len(unlocated),
+    }
+
+def plan_region_routes(
+    db: Session,
+    day: date,
+    region: Optional[str] = None,
+    include_overdue: bool = True,
+    time_budget: float = 0.5
+):
+    """
+    Itineraries for every technician with stops in a region on a day. The
+    2-opt time budget is shared: each technician gets an even split of
+    whatever is left.
+    """
+    by_technician = defaultdict(list)
+    for row in get_route_stops(db, day, region=region, include_overdue=include_overdue):
+        by_technician[row.technician_id].append(row)
+
+    technicians = dict(db.query(models.Technician.technician_id, models.Technician.name).filter(
+        models.Technician.technician_id.in_(list(by_technician))
+    ).all()) if by_technician else {}
+
+    deadline = time.perf_counter() + time_budget
+    routes = []
+    for remaining, (tech_id, rows) in zip(range(len(by_technician), 0, -1), sorted(by_technician.items())):
+        share = max(deadline - time.perf_counter(), 0.0) / remaining
+        routes.append({
+            "technician_id": tech_id,
+            "technician_name": technicians.get(tech_id),
+            **build_itinerary(rows, time_budget=share)
+        })
+    return routes
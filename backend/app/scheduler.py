@@ -0,0 +1,196 @@
+"""
+Technician auto-assignment for Scheduled deployment tasks.
+
+Tasks, technicians and current open load are read with three queries; the
+balancing itself runs on in-memory counters and the result is written back
+with a single guarded bulk UPDATE.
+"""
+import heapq
+from collections import defaultdict
+from datetime import date, datetime
+from typing import List, Optional
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+from . import models
+
+OPEN_STATUSES = ['Scheduled', 'InProgress']
+
+def _unassigned_tasks(db: Session, task_ids: Optional[List[int]] = None, region: Optional[str] = None):
+    query = db.query(
+        models.DeploymentTask.task_id,
+        models.DeploymentTask.scheduled_date,
+        models.FDH.region
+    ).join(
+        models.Customer, models.DeploymentTask.customer_id == models.Customer.customer_id
+    ).outerjoin(
+        models.Splitter, models.Customer.splitter_id == models.Splitter.splitter_id
+    ).outerjoin(
+        models.FDH, models.Splitter.fdh_id == models.FDH.fdh_id
+    ).filter(
+        models.DeploymentTask.status == 'Scheduled',
+        models.DeploymentTask.technician_id.is_(None),
+        models.Customer.deleted_at.is_(None)
+    )
+    if task_ids is not None:
+        query = query.filter(models.DeploymentTask.task_id.in_(task_ids))
+    if region:
+        query = query.filter(models.FDH.region == region)
+    return query.order_by(
+        models.DeploymentTask.scheduled_date, models.DeploymentTask.created_at, models.DeploymentTask.task_id
+    ).all()
+
+def plan_assignments(
+    db: Session,
+    task_ids: Optional[List[int]] = None,
+    region: Optional[str] = None
+):
+    """
+    Work out technician assignments without writing anything.
+    
+    A task goes to a technician whose region matches the customer's FDH region
+    and who is still under daily_capacity for the task's scheduled day; ties go
+    to the technician with the lower load that day, then the lower total open load.
+    Tasks without a scheduled date count against today's capacity; their date
+    stays unset.
+    """
+    today = date.today()
+    tasks = _unassigned_tasks(db, task_ids, region)
+    
+    technicians = db.query(
+        models.Technician.technician_id,
+        models.Technician.name,
+        models.Technician.region,
+        models.Technician.daily_capacity
+    ).filter(models.Technician.region.isnot(None))
+    if region:
+        technicians = technicians.filter(models.Technician.region == region)
+    technicians_by_region = defaultdict(list)
+    names = {}
+    capacity = {}
+    for technician_id, name, tech_region, daily_capacity in technicians.all():
+        technicians_by_region[tech_region].append(technician_id)
+        names[technician_id] = name
+        capacity[technician_id] = daily_capacity or 0
+    
+    day_load = defaultdict(int)
+    open_load = defaultdict(int)
+    load_rows = db.query(
+        models.DeploymentTask.technician_id,
+        models.DeploymentTask.scheduled_date,
+        func.count(models.DeploymentTask.task_id)
+    ).filter(
+        models.DeploymentTask.technician_id.isnot(None),
+        models.DeploymentTask.status.in_(OPEN_STATUSES)
+    ).group_by(models.DeploymentTask.technician_id, models.DeploymentTask.scheduled_date).all()
+    for technician_id, scheduled_date, count in load_rows:
+        day_load[(technician_id, scheduled_date or today)] += count
+        open_load[technician_id] += count
+    
+    # One lazily-built min-heap of (day load, open load, technician) per (region, day).
+    # Loads only grow, so a stale heap entry is refreshed when it reaches the top.
+    heaps = {}
+    
+    def pick_technician(task_region, day):
+        heap = heaps.get((task_region, day))
+        if heap is None:
+            heap = [(day_load[(t, day)], open_load[t], t) for t in technicians_by_region[task_region]]
+            heapq.heapify(heap)
+            heaps[(task_region, day)] = heap
+        while heap:
+            entry = heap[0]
+            technician_id = entry[2]
+            current = (day_load[(technician_id, day)], open_load[technician_id], technician_id)
+            if current[0] >= capacity[technician_id]:
+                heapq.heappop(heap)
+            elif current != entry:
+                heapq.heapreplace(heap, current)
+            else:
+                return technician_id
+        return None
+    
+    assignments = []
+    unassigned = []
+    for task_id, scheduled_date, task_region in tasks:
+        day = scheduled_date or today
+        if not technicians_by_region.get(task_region):
+            unassigned.append({"task_id": task_id, "region": task_region, "reason": "No technician in region"})
+            continue
+        
+        technician_id = pick_technician(task_region, day)
+        if technician_id is None:
+            unassigned.append({"task_id": task_id, "region": task_region, "reason": f"All technicians at capacity on {day}"})
+            continue
+        
+        day_load[(technician_id, day)] += 1
+        open_load[technician_id] += 1
+        assignments.append({
+            "task_id": task_id,
+            "technician_id": technician_id,
+            "technician_name": names[technician_id],
+            "region": task_region,
+            "scheduled_date": scheduled_date
+        })
+    
+    return assignments, unassigned
+
+def apply_assignments(db: Session, assignments: List[dict]) -> List[int]:
+    """
+    Write planned assignments in one bulk UPDATE (caller commits). Tasks that
+    were assigned or moved out of Scheduled since planning are left alone;
+    their ids are returned.
+    """
+    if not assignments:
+        return []
+    Task = models.DeploymentTask
+    # Lock the tasks that are still assignable so nothing changes them before commit
+    still_open = {
+        task_id for (task_id,) in db.query(Task.task_id).filter(
+            Task.task_id.in_([a["task_id"] for a in assignments]),
+            Task.technician_id.is_(None),
+            Task.status == 'Scheduled'
+        ).with_for_update()
+    }
+    rows = [
+        {"b_task_id": a["task_id"], "b_technician_id": a["technician_id"]}
+        for a in assignments if a["task_id"] in still_open
+    ]
+    if rows:
+        table = Task.__table__
+        db.execute(
+            update(table).where(
+                table.c.task_id == bindparam("b_task_id"),
+                table.c.technician_id.is_(None),
+                table.c.status == 'Scheduled'
+            ).values(technician_id=bindparam("b_technician_id"), updated_at=datetime.utcnow()),
+            rows
+        )
+    return [a["task_id"] for a in assignments if a["task_id"] not in still_open]
+
+def auto_assign_tasks(
+    db: Session,
+    task_ids: Optional[List[int]] = None,
+    region: Optional[str] = None,
+    dry_run: bool = False
+):
+    """Plan and (unless dry_run) apply technician assignments"""
+    assignments, unassigned = plan_assignments(db, task_ids, region)
+    skipped = []
+    if not dry_run and assignments:
+        try:
+            skipped = apply_assignments(db, assignments)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        skipped_ids = set(skipped)
+        assignments = [a for a in assignments if a["task_id"] not in skipped_ids]
+    
+    return {
+        "dry_run": dry_run,
+        "assigned": len(assignments),
+        "unassigned": len(unassigned),
+        "skipped": len(skipped),
+        "assignments": assignments,
+        "unassigned_tasks": unassigned,
+        "skipped_task_ids": skipped
+    }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime, date
 from enum import Enum
 
@@ -56,6 +56,7 @@ class Asset(AssetBase):
     assigned_to_customer_id: Optional[int] = None
     assigned_date: Optional[datetime] = None
     created_at: datetime
+    row_version: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -83,6 +84,8 @@ class FDHBase(BaseModel):
     region: Optional[str] = None
     max_ports: int = 8
     headend_id: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class FDHCreate(FDHBase):
     pass
@@ -101,6 +104,8 @@ class SplitterBase(BaseModel):
     port_capacity: int = 8
     used_ports: int = 0
     location: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class SplitterCreate(SplitterBase):
     pass
@@ -119,6 +124,8 @@ class CustomerBase(BaseModel):
     neighborhood: Optional[str] = None
     plan: Optional[str] = None
     connection_type: ConnectionType = ConnectionType.Wired
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class CustomerCreate(CustomerBase):
     pass
@@ -129,6 +136,17 @@ class Customer(CustomerBase):
     splitter_id: Optional[int] = None
     assigned_port: Optional[int] = None
     created_at: datetime
+    row_version: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class CustomerSummary(BaseModel):
+    customer_id: int
+    name: str
+    address: Optional[str] = None
+    neighborhood: Optional[str] = None
+    status: CustomerStatus
 
     class Config:
         from_attributes = True
@@ -179,6 +197,15 @@ class CustomerUpdate(BaseModel):
     status: Optional[CustomerStatus] = None
     splitter_id: Optional[int] = None
     assigned_port: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+class BulkCustomerStatusRequest(BaseModel):
+    """Select customers by explicit IDs and/or a filter"""
+    customer_ids: Optional[List[int]] = None
+    neighborhood: Optional[str] = None
+    splitter_id: Optional[int] = None
+    reason: Optional[str] = None
 
 # Customer Onboarding Schema
 class CustomerOnboardingCreate(BaseModel):
@@ -192,6 +219,8 @@ class CustomerOnboardingCreate(BaseModel):
     ont_id: Optional[int] = None
     router_id: Optional[int] = None
     fiber_length_meters: Optional[float] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 # Deployment Task Schemas
 class TaskStatus(str, Enum):
@@ -218,6 +247,34 @@ class DeploymentTaskUpdate(BaseModel):
 class DeploymentTask(DeploymentTaskBase):
     task_id: int
     status: TaskStatus
+    completed_at: Optional[datetime] = None
+    overdue_since: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+    row_version: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class TaskNoteCreate(BaseModel):
+    body: str
+    status: Optional[TaskStatus] = None
+
+class TaskNote(TaskNoteCreate):
+    note_id: int
+    task_id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class DeploymentTaskSummary(BaseModel):
+    task_id: int
+    customer_id: int
+    technician_id: Optional[int] = None
+    status: TaskStatus
+    scheduled_date: Optional[date] = None
+    overdue_since: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -228,11 +285,47 @@ class DeploymentTaskDetail(DeploymentTask):
     customer: Optional[Customer] = None
     technician: Optional['Technician'] = None
 
+class BulkTaskCreateRequest(BaseModel):
+    """Create tasks for pending customers selected by IDs and/or a filter"""
+    customer_ids: Optional[List[int]] = None
+    neighborhood: Optional[str] = None
+    splitter_id: Optional[int] = None
+    technician_id: Optional[int] = None
+    scheduled_date: Optional[date] = None
+    notes: Optional[str] = None
+    auto_assign: bool = False
+
+class SyncChange(BaseModel):
+    """One queued offline edit; base_version is the row_version the edit was made on"""
+    entity: Literal['task', 'customer']
+    id: int
+    base_version: Optional[int] = None
+    fields: Dict[str, Any] = {}
+
+class SyncPushRequest(BaseModel):
+    technician_id: Optional[int] = None
+    changes: List[SyncChange]
+
+class BatchSubRequest(BaseModel):
+    """An internal GET, e.g. {"id": "fdhs", "path": "/topology/fdhs?region=North"}"""
+    id: Optional[str] = None
+    method: Literal['GET'] = 'GET'
+    path: str
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+class AutoAssignRequest(BaseModel):
+    task_ids: Optional[List[int]] = None
+    region: Optional[str] = None
+    dry_run: bool = False
+
 # Technician Schemas
 class TechnicianBase(BaseModel):
     name: str
     contact: Optional[str] = None
     region: Optional[str] = None
+    daily_capacity: int = 4
 
 class TechnicianCreate(TechnicianBase):
     pass
@@ -244,6 +337,20 @@ class Technician(TechnicianBase):
     class Config:
         from_attributes = True
 
+class TechnicianSummary(BaseModel):
+    technician_id: int
+    name: str
+    contact: Optional[str] = None
+    region: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class TechnicianTaskItem(BaseModel):
+    task: DeploymentTaskSummary
+    customer: CustomerSummary
+    technician: Optional[TechnicianSummary] = None
+
 # Customer with Assets Detail
 class CustomerDetail(Customer):
     assigned_assets: List[Asset] = []
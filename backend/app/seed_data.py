@@ -36,6 +36,8 @@ def seed_database():
         fdh_a = models.FDH(
             name="FDH A",
             location="Zone A, Block 1",
+            latitude=40.712800,
+            longitude=-74.006000,
             region="Central",
             max_ports=8,
             headend_id=headend1.headend_id
@@ -43,6 +45,8 @@ def seed_database():
         fdh_b = models.FDH(
             name="FDH B",
             location="Zone B, Block 2",
+            latitude=40.718200,
+            longitude=-73.995800,
             region="Central",
             max_ports=8,
             headend_id=headend1.headend_id
@@ -50,6 +54,8 @@ def seed_database():
         fdh_c = models.FDH(
             name="FDH C",
             location="Zone C, Block 1",
+            latitude=40.787900,
+            longitude=-73.975400,
             region="North",
             max_ports=8,
             headend_id=headend2.headend_id
@@ -65,28 +71,36 @@ def seed_database():
             model="SPL-8x",
             port_capacity=8,
             used_ports=2,
-            location="Zone A, Neighborhood 1"
+            location="Zone A, Neighborhood 1",
+            latitude=40.710900,
+            longitude=-74.008600
         )
         splitter_a2 = models.Splitter(
             fdh_id=fdh_a.fdh_id,
             model="SPL-8x",
             port_capacity=8,
             used_ports=2,
-            location="Zone A, Neighborhood 2"
+            location="Zone A, Neighborhood 2",
+            latitude=40.714600,
+            longitude=-74.002100
         )
         splitter_b1 = models.Splitter(
             fdh_id=fdh_b.fdh_id,
             model="SPL-8x",
             port_capacity=8,
             used_ports=1,
-            location="Zone B, Neighborhood 1"
+            location="Zone B, Neighborhood 1",
+            latitude=40.720100,
+            longitude=-73.993000
         )
         splitter_c1 = models.Splitter(
             fdh_id=fdh_c.fdh_id,
             model="SPL-16x",
             port_capacity=16,
             used_ports=0,
-            location="Zone C, Neighborhood 1"
+            location="Zone C, Neighborhood 1",
+            latitude=40.789800,
+            longitude=-73.972300
         )
         db.add_all([splitter_a1, splitter_a2, splitter_b1, splitter_c1])
         db.commit()
@@ -320,6 +334,12 @@ def seed_database():
         db.commit()
         print(f"Created 5 Fiber Drop Lines")
         
+        # Build customer search index
+        print("Indexing customers for search...")
+        from .crud import rebuild_customer_search_index
+        indexed = rebuild_customer_search_index(db)
+        print(f"Indexed {indexed} customers")
+        
         # Create Users FIRST (before technicians)
         print("Creating Users...")
         import bcrypt
@@ -4,9 +4,16 @@ USE network_inventory;
 
 -- Drop existing tables if they exist (for clean setup)
 DROP TABLE IF EXISTS AuditLog;
+DROP TABLE IF EXISTS ReportSnapshot;
+DROP TABLE IF EXISTS SyncTombstone;
+DROP TABLE IF EXISTS SyncVersion;
+DROP TABLE IF EXISTS TaskNote;
+DROP TABLE IF EXISTS DeploymentDailyRollup;
+DROP TABLE IF EXISTS CustomerStatusEvent;
 DROP TABLE IF EXISTS DeploymentTask;
 DROP TABLE IF EXISTS FiberDropLine;
 DROP TABLE IF EXISTS AssignedAssets;
+DROP TABLE IF EXISTS CustomerSearchToken;
 DROP TABLE IF EXISTS Asset;
 DROP TABLE IF EXISTS Customer;
 DROP TABLE IF EXISTS Splitter;
@@ -15,6 +22,25 @@ DROP TABLE IF EXISTS Headend;
 DROP TABLE IF EXISTS Technician;
 DROP TABLE IF EXISTS User;
 
+-- SyncVersion Table (row versions for delta sync, one per write transaction)
+CREATE TABLE SyncVersion (
+    version_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    allocated_at DATETIME NOT NULL,
+    finished BOOLEAN NOT NULL DEFAULT FALSE,
+    INDEX idx_sync_version_finished (finished, version_id)
+);
+
+-- SyncTombstone Table (deleted rows for delta sync)
+CREATE TABLE SyncTombstone (
+    tombstone_id INT PRIMARY KEY AUTO_INCREMENT,
+    entity ENUM('DeploymentTask', 'Customer', 'Asset') NOT NULL,
+    entity_id INT NOT NULL,
+    technician_id INT,
+    row_version BIGINT,
+    deleted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_SyncTombstone_row_version (row_version)
+);
+
 -- Headend Table
 CREATE TABLE Headend (
     headend_id INT PRIMARY KEY AUTO_INCREMENT,
@@ -32,6 +58,8 @@ CREATE TABLE FDH (
     region VARCHAR(100),
     max_ports INT DEFAULT 8,
     headend_id INT,
+    latitude DECIMAL(9, 6),
+    longitude DECIMAL(9, 6),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (headend_id) REFERENCES Headend(headend_id)
 );
@@ -44,6 +72,8 @@ CREATE TABLE Splitter (
     port_capacity INT DEFAULT 8,
     used_ports INT DEFAULT 0,
     location VARCHAR(200),
+    latitude DECIMAL(9, 6),
+    longitude DECIMAL(9, 6),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (fdh_id) REFERENCES FDH(fdh_id)
 );
@@ -59,10 +89,25 @@ CREATE TABLE Customer (
     status ENUM('Active', 'Inactive', 'Pending') DEFAULT 'Pending',
     splitter_id INT,
     assigned_port INT,
+    latitude DECIMAL(9, 6),
+    longitude DECIMAL(9, 6),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    deleted_at DATETIME NULL,
+    row_version BIGINT,
     FOREIGN KEY (splitter_id) REFERENCES Splitter(splitter_id)
 );
 
+-- CustomerSearchToken Table (prefix search index over name, address, neighborhood)
+CREATE TABLE CustomerSearchToken (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    customer_id INT NOT NULL,
+    token VARCHAR(100) NOT NULL,
+    field ENUM('name', 'address', 'neighborhood') NOT NULL,
+    FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE,
+    INDEX idx_search_token (token, customer_id, field),
+    INDEX idx_search_customer (customer_id)
+);
+
 -- Asset Table
 CREATE TABLE Asset (
     asset_id INT PRIMARY KEY AUTO_INCREMENT,
@@ -74,6 +119,7 @@ CREATE TABLE Asset (
     assigned_to_customer_id INT NULL,
     assigned_date DATETIME NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    row_version BIGINT,
     INDEX idx_asset_type (asset_type),
     INDEX idx_status (status),
     INDEX idx_serial (serial_number)
@@ -108,6 +154,8 @@ CREATE TABLE Technician (
     name VARCHAR(100) NOT NULL,
     contact VARCHAR(50),
     region VARCHAR(100),
+    daily_capacity INT DEFAULT 4,
+    user_id INT UNIQUE,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -119,10 +167,69 @@ CREATE TABLE DeploymentTask (
     status ENUM('Scheduled', 'InProgress', 'Completed', 'Failed') DEFAULT 'Scheduled',
     scheduled_date DATE,
     notes TEXT,
+    completed_at DATETIME,
+    overdue_since DATETIME,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    row_version BIGINT,
     FOREIGN KEY (customer_id) REFERENCES Customer(customer_id),
-    FOREIGN KEY (technician_id) REFERENCES Technician(technician_id)
+    FOREIGN KEY (technician_id) REFERENCES Technician(technician_id),
+    INDEX idx_task_status_scheduled (status, scheduled_date),
+    INDEX idx_task_overdue (overdue_since)
+);
+
+-- TaskNote Table (append-only deployment task notes)
+CREATE TABLE TaskNote (
+    note_id INT PRIMARY KEY AUTO_INCREMENT,
+    task_id INT NOT NULL,
+    status VARCHAR(20),
+    body TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (task_id) REFERENCES DeploymentTask(task_id) ON DELETE CASCADE,
+    INDEX idx_task_note_task_created (task_id, created_at)
+);
+
+-- DeploymentDailyRollup Table (daily deployment outcomes per technician/region)
+CREATE TABLE DeploymentDailyRollup (
+    rollup_id INT PRIMARY KEY AUTO_INCREMENT,
+    bucket_date DATE NOT NULL,
+    technician_id INT NOT NULL DEFAULT 0,
+    region VARCHAR(100) NOT NULL DEFAULT '',
+    completed INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    lead_time_hours_total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    lead_le_1d INT NOT NULL DEFAULT 0,
+    lead_le_3d INT NOT NULL DEFAULT 0,
+    lead_le_7d INT NOT NULL DEFAULT 0,
+    lead_le_14d INT NOT NULL DEFAULT 0,
+    lead_gt_14d INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_rollup_bucket (bucket_date, technician_id, region)
+);
+
+-- CustomerStatusEvent Table (customer status transitions)
+CREATE TABLE CustomerStatusEvent (
+    event_id INT PRIMARY KEY AUTO_INCREMENT,
+    customer_id INT NOT NULL,
+    from_status VARCHAR(20),
+    to_status VARCHAR(20) NOT NULL,
+    reclaimed_assets INT NOT NULL DEFAULT 0,
+    reason VARCHAR(200),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES Customer(customer_id) ON DELETE CASCADE,
+    INDEX idx_status_event_to_created (to_status, created_at),
+    INDEX idx_status_event_customer (customer_id, created_at)
+);
+
+-- ReportSnapshot Table (precomputed nightly reports)
+CREATE TABLE ReportSnapshot (
+    snapshot_id INT PRIMARY KEY AUTO_INCREMENT,
+    report VARCHAR(50) NOT NULL,
+    period_start DATE,
+    period_end DATE,
+    payload JSON NOT NULL,
+    generated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INT,
+    INDEX idx_report_snapshot_generated (report, generated_at)
 );
 
 -- User Table (For Role-based Access)
@@ -145,9 +252,17 @@ CREATE TABLE AuditLog (
     FOREIGN KEY (user_id) REFERENCES User(user_id)
 );
 
+-- Technician -> User link (User is created after Technician)
+ALTER TABLE Technician ADD FOREIGN KEY (user_id) REFERENCES User(user_id);
+
 -- Create indexes for better performance
 CREATE INDEX idx_customer_status ON Customer(status);
 CREATE INDEX idx_customer_splitter ON Customer(splitter_id);
+CREATE INDEX idx_customer_status_created ON Customer(status, created_at);
+CREATE INDEX idx_customer_deleted ON Customer(deleted_at, status);
 CREATE INDEX idx_asset_customer ON Asset(assigned_to_customer_id);
 CREATE INDEX idx_deployment_status ON DeploymentTask(status);
-CREATE INDEX idx_deployment_tech ON DeploymentTask(technician_id);
\ No newline at end of file
+CREATE INDEX idx_deployment_tech ON DeploymentTask(technician_id);
+CREATE INDEX ix_Customer_row_version ON Customer(row_version);
+CREATE INDEX ix_Asset_row_version ON Asset(row_version);
+CREATE INDEX ix_DeploymentTask_row_version ON DeploymentTask(row_version);
\ No newline at end of file
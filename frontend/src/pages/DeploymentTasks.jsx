@@ -801,6 +801,21 @@ function DeploymentTasks() {
                 </div>
               )}
 
+              {/* Task Notes (latest first) */}
+              {taskDetails.notes && taskDetails.notes.length > 0 && (
+                <div style={{ marginBottom: '1.5rem' }}>
+                  <h4 style={{ marginBottom: '0.5rem' }}>📝 Task Notes</h4>
+                  {taskDetails.notes.map((note) => (
+                    <div key={note.note_id} style={{ background: '#f9fafb', padding: '1rem', borderRadius: '4px', whiteSpace: 'pre-wrap', fontSize: '0.875rem', marginBottom: '0.5rem' }}>
+                      <div style={{ color: '#6b7280', fontSize: '0.75rem', marginBottom: '0.25rem' }}>
+                        {new Date(note.created_at).toLocaleString()}{note.status ? ` · Status: ${note.status}` : ''}
+                      </div>
+                      {note.body}
+                    </div>
+                  ))}
+                </div>
+              )}
+
               {/* Installation Notes */}
               {taskDetails.task.notes && (
                 <div style={{ marginBottom: '1.5rem' }}>